@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the signal generation and correlation hot paths.
+
+Every benchmark is run over a grid of code lengths (m-sequences of the degrees 7, 10 and 13,
+16 on request by --degrees) and oversampling factors. The run time is the best and the median
+of several repetitions, the peak memory is the largest size of the memory allocated by the
+benchmark during one extra run, measured by *tracemalloc* (numpy arrays are included). The
+results are written into a JSON file, which can be stored and used as the baseline of the
+following runs:
+
+    python benchmarks.py -o ../data/bench_baseline.json
+    python benchmarks.py --baseline ../data/bench_baseline.json --tolerance 0.25
+
+With a baseline every case is compared by its best time, the cases slower by more than
+*tolerance* are reported as regressions and the script exits with the status 1. Only the
+results measured on the same machine are comparable.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import tracemalloc
+import numpy as np
+
+from siggens import PRN_bitstreams as prn
+from siggens import train_pulse as gen
+from siggens import polynomials as pl
+from modulators import constallation_mappers as cm
+from modulators import up_convertors as uc
+from dsp import corrNumpy as ncorr
+
+RESULTS_VERSION = 1
+
+# primitive polynomials of the benchmarked code lengths 2**m - 1
+BENCH_POLYS = {7: 0o211, 10: 0o2011, 13: 0o20033, 16: 0o210013}
+OVERSAMPLING = (4, 16)
+CHIP_RATE = 1e3
+
+
+def _code(m):
+    fb = pl.fb_taps(BENCH_POLYS[m])
+    init = np.zeros(m, dtype=int)
+    init[0] = 1
+    return init, fb
+
+
+def _time_axis(n, osf):
+    return np.arange(n * osf) / (CHIP_RATE * osf)
+
+
+# every case builds its inputs from (degree, oversampling) and returns the benchmarked call,
+# cases independent of the oversampling have None in the oversampling column of the grid
+
+def _case_ssrg(m, osf):
+    init, fb = _code(m)
+    return lambda: prn.ssrg(init, fb, n_bits=2 ** m - 1)
+
+
+def _case_gold_seq(m, osf):
+    return lambda: prn.gold_seq(2, 6, no_bits=2 ** m - 1)
+
+
+def _case_rect_tr(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: gen.rect_tr(t, 1 / CHIP_RATE, 0, 0, code)
+
+
+def _case_sinc_tr(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: gen.sinc_tr(t, 1 / CHIP_RATE, 0, code, 1 / CHIP_RATE, span=8)
+
+
+def _case_rcos_tr(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: gen.rcos_tr(t, 1 / CHIP_RATE, 0, code, 1 / CHIP_RATE, .8, span=8)
+
+
+def _case_sinc_tr_full(m, osf):
+    # the default train without a span, the window of pulses widened per sample
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: gen.sinc_tr(t, 1 / CHIP_RATE, 0, code, 1 / CHIP_RATE)
+
+
+def _case_rcos_tr_full(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: gen.rcos_tr(t, 1 / CHIP_RATE, 0, code, 1 / CHIP_RATE, .8)
+
+
+def _case_sinc_tr_sparse(m, osf):
+    # a single nonzero chip, the worst case of the widened window
+    code = np.zeros(2 ** m - 1)
+    code[code.size // 2] = 1
+    t = _time_axis(code.size, osf)
+    return lambda: gen.sinc_tr(t, 1 / CHIP_RATE, 0, code, 1 / CHIP_RATE)
+
+
+def _case_rect_bpsk_map(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: cm.rect_bpsk_map(t, code, CHIP_RATE)
+
+
+def _case_rect_qpsk_map(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size // 2, osf)
+    return lambda: cm.rect_qpsk_map(t, code, CHIP_RATE)
+
+
+def _case_sinc_bpsk_map(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: cm.sinc_bpsk_map(t, code, CHIP_RATE)
+
+
+def _case_sinc_qpsk_map(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size // 2, osf)
+    return lambda: cm.sinc_qpsk_map(t, code, CHIP_RATE)
+
+
+def _case_rcos_bpsk_map(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size, osf)
+    return lambda: cm.rcos_bpsk_map(t, code, CHIP_RATE)
+
+
+def _case_rcos_qpsk_map(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size // 2, osf)
+    return lambda: cm.rcos_qpsk_map(t, code, CHIP_RATE, span=8)
+
+
+def _case_quad_mod(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    t = _time_axis(code.size // 2, osf)
+    bb = cm.rect_qpsk_map(t, code, CHIP_RATE)
+    return lambda: uc.quad_mod(bb, t, CHIP_RATE * osf / 4, 0, 0, 0)
+
+
+def _case_corr_fd(m, osf):
+    code = prn.ssrg(*_code(m), n_bits=2 ** m - 1)
+    x = gen.rect_tr(_time_axis(code.size, osf), 1 / CHIP_RATE, 0, 0, code) * 2.0 - 1
+    return lambda: ncorr.corr_fd(x, x, cache=False)
+
+
+CASES = {"ssrg": (_case_ssrg, False),
+         "gold_seq": (_case_gold_seq, False),
+         "rect_tr": (_case_rect_tr, True),
+         "sinc_tr": (_case_sinc_tr, True),
+         "rcos_tr": (_case_rcos_tr, True),
+         "sinc_tr_full": (_case_sinc_tr_full, True),
+         "rcos_tr_full": (_case_rcos_tr_full, True),
+         "sinc_tr_sparse": (_case_sinc_tr_sparse, True),
+         "rect_bpsk_map": (_case_rect_bpsk_map, True),
+         "rect_qpsk_map": (_case_rect_qpsk_map, True),
+         "sinc_bpsk_map": (_case_sinc_bpsk_map, True),
+         "sinc_qpsk_map": (_case_sinc_qpsk_map, True),
+         "rcos_bpsk_map": (_case_rcos_bpsk_map, True),
+         "rcos_qpsk_map": (_case_rcos_qpsk_map, True),
+         "quad_mod": (_case_quad_mod, True),
+         "corr_fd": (_case_corr_fd, True)}
+
+
+def case_key(case):
+    """
+    Key of a benchmark case, the same in the results and in the baseline
+    """
+    return "%s[m=%s,osf=%s]" % (case["name"], case["degree"], case["oversampling"])
+
+
+def measure(fn, repeat=5):
+    """
+    Run time and peak memory of a call, one untimed call first takes the lazy imports and
+    the caches filled by the first call out of the timing
+
+    :param fn: function without arguments
+    :param repeat: number of timed calls
+    :return: tuple (best, median, peak), times in seconds, peak memory in bytes
+    """
+    fn()
+    times = []
+    for _ in range(max(int(repeat), 1)):
+        t_start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t_start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), float(np.median(times)), peak
+
+
+def run_benchmarks(names=None, degrees=(7, 10, 13), oversampling=OVERSAMPLING, repeat=5,
+                   verbose=False):
+    """
+    Runs the benchmarks over the grid of code lengths and oversampling factors
+
+    :param names: names of the cases of *CASES* to run, all when None
+    :param degrees: degrees of the benchmarked m-sequences, lengths 2**m - 1
+    :param oversampling: oversampling factors of the signal cases
+    :param repeat: number of timed calls of every case
+    :param verbose: print every case as it is finished
+    :return: results, a dictionary serializable to JSON
+    """
+    cases = []
+    for name in (names or CASES):
+        make, sampled = CASES[name]
+        for m in degrees:
+            for osf in (oversampling if sampled else (None,)):
+                best, median, peak = measure(make(m, osf), repeat)
+                n = 2 ** m - 1
+                case = {"name": name, "degree": m, "oversampling": osf, "code_length": n,
+                        "samples": n * osf if osf else n, "best_s": best, "median_s": median,
+                        "peak_bytes": peak}
+                cases.append(case)
+                if verbose:
+                    print("%-34s best %10.6f s  median %10.6f s  peak %8.1f MB"
+                          % (case_key(case), best, median, peak / 2 ** 20))
+    return {"version": RESULTS_VERSION,
+            "created": datetime.datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "repeat": repeat,
+            "cases": cases}
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compares the best times of the results with the baseline
+
+    :param results: results of *run_benchmarks*
+    :param baseline: results of an earlier run
+    :param tolerance: accepted relative slowdown
+    :return: list of tuples (key, ratio, regression), ratio is the time of the results over
+             the time of the baseline, the cases missing in the baseline are skipped
+    """
+    base = {case_key(c): c for c in baseline["cases"]}
+    report = []
+    for case in results["cases"]:
+        key = case_key(case)
+        if key in base and base[key]["best_s"] > 0:
+            ratio = case["best_s"] / base[key]["best_s"]
+            report.append((key, ratio, ratio > 1 + tolerance))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='''Benchmarks of the signal generation
+                                                    and correlation functions.''')
+    parser.add_argument("-o", "--output", help="JSON file the results are written into")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="accepted relative slowdown against the baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls of every case")
+    parser.add_argument("--quick", action="store_true",
+                        help="only the shortest codes and the smallest oversampling")
+    parser.add_argument("--degrees", type=int, nargs="+",
+                        help="degrees of the benchmarked codes, default 7 10 13")
+    parser.add_argument("-k", "--cases", nargs="+", choices=sorted(CASES),
+                        help="cases to run, all by default")
+    argv = parser.parse_args(argv)
+
+    degrees = (7, 10) if argv.quick else (7, 10, 13)
+    if argv.degrees:
+        degrees = argv.degrees
+    oversampling = OVERSAMPLING[:1] if argv.quick else OVERSAMPLING
+    results = run_benchmarks(argv.cases, degrees, oversampling, argv.repeat, verbose=True)
+    if argv.output:
+        with open(argv.output, 'w') as f:
+            json.dump(results, f, indent=1)
+        print("results written to %s" % argv.output)
+
+    if argv.baseline:
+        with open(argv.baseline) as f:
+            baseline = json.load(f)
+        report = compare(results, baseline, argv.tolerance)
+        for key, ratio, regression in report:
+            print("%-34s %6.2fx %s" % (key, ratio, "REGRESSION" if regression else ""))
+        if any(r for _, _, r in report):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Monte Carlo simulation of the bit error rate over the AWGN channel, the batch mode
+``run.py -b ber`` of the runner.
+
+Every point of the Eb/N0 sweep is simulated by a worker process in batches. A batch maps
+random bits by *constallation_mappers.lut_map* into the baseband signal, adds white gaussian
+noise, passes the signal through the matched filter and the hard decisions of
+*demodulators.symbol_detectors* and counts the bit errors. The point stops early when
+*target_errors* errors are counted, so the high Eb/N0 points do not run longer than needed,
+or when *max_bits* bits are simulated.
+
+Only the rectangular pulses are simulated. The sinc and raised cosine trains of *train_pulse*
+are envelopes (maxima) of the pulses, not their sums, so the signal is not linear in the
+symbols and its bit error rate does not follow the theory of the AWGN channel, *ber_curve*
+raises ValueError for those pulses.
+
+The noise is added to the complex baseband signal, the equivalent of the passband channel.
+Its variance is set from the energy of the constellation and the taps of the matched filter,
+the output of the filter has the noise of the variance N0 / 2 in each component for the
+symbols of the average energy Es = bits_per_symbol * Eb.
+
+Every point draws from its own random generator spawned from one *numpy.random.SeedSequence*,
+so the results depend only on the seed, not on the number of workers or on the order in which
+the points are finished. One row per point is written into a CSV file as soon as the point is
+finished:
+
+* *ebn0_db* - Eb/N0 of the point in dB, *bits* - simulated bits, *errors* - bit errors,
+* *ber* - errors / bits, *stop* - 'errors' when the target of errors was reached,
+  'max_bits' otherwise.
+"""
+import os
+import csv
+import logging
+import concurrent.futures
+import numpy as np
+
+from modulators import constallation_mappers as cm
+from demodulators import symbol_detectors as sd
+
+RESULT_FIELDS = ("ebn0_db", "bits", "errors", "ber", "stop")
+
+
+def noise_sigma(ebn0_db, modulation, taps):
+    """
+    Standard deviation of the noise of one component of the baseband samples
+
+    :param ebn0_db: Eb/N0 in dB
+    :param modulation: bpsk, qpsk, 8psk or 16qam, see *constallation_mappers.CONSTELLATIONS*
+    :param taps: taps of the matched filter, see *symbol_detectors.pulse_taps*
+    :return: sigma of the real and of the imaginary part of the noise
+    """
+    es = np.mean(np.abs(cm.CONSTELLATIONS[modulation]) ** 2)
+    ebn0 = 10 ** (ebn0_db / 10)
+    return float(np.sqrt(es / (2 * cm.bits_per_symbol(modulation) * ebn0 * np.dot(taps, taps))))
+
+
+def ber_point(ebn0_db, rng, **args):
+    """
+    Bit error rate of one Eb/N0 point
+
+    :param ebn0_db: Eb/N0 in dB
+    :param rng: numpy random generator of the bits and of the noise
+    :param args: optional arguments, see the table.
+
+    +---------------+-------------+-----------+------------------------------------------------+
+    | Key word      | Possible    | Default   | Description                                    |
+    |               | values      |           |                                                |
+    +===============+=============+===========+================================================+
+    | modulation    | bpsk, qpsk, |   bpsk    |  table of the constellation                    |
+    |               | 8psk, 16qam |           |                                                |
+    +---------------+-------------+-----------+------------------------------------------------+
+    | pulse         | rect        |   rect    |  shape of the pulse, see the module docstring  |
+    |               |             |           |                                                |
+    +---------------+-------------+-----------+------------------------------------------------+
+    | sps           | positive    |   4       |  samples per symbol                            |
+    |               | int         |           |                                                |
+    +---------------+-------------+-----------+------------------------------------------------+
+    | target_errors | positive    |   100     |  the point stops when this number of errors is |
+    |               | int         |           |  counted                                       |
+    +---------------+-------------+-----------+------------------------------------------------+
+    | max_bits      | positive    |   1e7     |  the point stops after this number of bits     |
+    |               | int         |           |                                                |
+    +---------------+-------------+-----------+------------------------------------------------+
+    | batch_bits    | positive    |   1e5     |  number of bits simulated in one batch         |
+    |               | int         |           |                                                |
+    +---------------+-------------+-----------+------------------------------------------------+
+
+    :return: result row, dictionary of RESULT_FIELDS
+    """
+    modulation = args.get('modulation', 'bpsk')
+    pulse = _check_pulse(args.get('pulse', 'rect'))
+    sps = int(args.get('sps', 4))
+    target_errors = int(args.get('target_errors', 100))
+    max_bits = int(args.get('max_bits', 10 ** 7))
+    k = cm.bits_per_symbol(modulation)
+    n_sym = max(int(args.get('batch_bits', 10 ** 5)) // k, 1)
+
+    # symbol rate 1, the time axis in symbol periods
+    taps, _ = sd.pulse_taps(pulse, 1.0, sps)
+    sigma = noise_sigma(ebn0_db, modulation, taps)
+    t = np.arange(n_sym * sps) / sps
+    bb = np.empty(t.size, dtype=complex)
+
+    bits = 0
+    errors = 0
+    while errors < target_errors and bits < max_bits:
+        data = rng.integers(0, 2, n_sym * k, dtype=np.uint8)
+        cm.lut_map(t, data, 1.0, modulation=modulation, pulse=pulse, out=bb)
+        bb.real += sigma * rng.standard_normal(t.size)
+        bb.imag += sigma * rng.standard_normal(t.size)
+        z = sd.matched_filter(bb, 1.0, sps, pulse=pulse)
+        decided = sd.hard_decisions(z, modulation)
+        n = min(decided.size, data.size)
+        errors += int(np.count_nonzero(decided[:n] != data[:n]))
+        bits += n
+    return {"ebn0_db": ebn0_db, "bits": bits, "errors": errors,
+            "ber": errors / bits if bits else float('nan'),
+            "stop": "errors" if errors >= target_errors else "max_bits"}
+
+
+def _check_pulse(pulse):
+    if pulse != 'rect':
+        raise ValueError("BER of the pulse '%s' is not simulated, the sinc and rcos trains are "
+                         "not linear in the symbols, use 'rect'" % pulse)
+    return pulse
+
+
+def _point_task(task):
+    ebn0_db, seed_seq, args = task
+    return ber_point(ebn0_db, np.random.default_rng(seed_seq), **args)
+
+
+def _completed(tasks, workers):
+    # results of the tasks in the order they are finished
+    if workers == 1:
+        for task in tasks:
+            yield _point_task(task)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(_point_task, task) for task in tasks]
+        for f in concurrent.futures.as_completed(futures):
+            yield f.result()
+
+
+def ber_curve(ebn0_dbs, seed=None, workers=None, filename=None, **args):
+    """
+    Bit error rates of the Eb/N0 points simulated in parallel
+
+    :param ebn0_dbs: list of Eb/N0 points in dB
+    :param seed: seed of the *SeedSequence* the generators of the points are spawned from,
+                 a random seed when None
+    :param workers: number of worker processes, all processors when None, 1 runs the
+                    simulation in the calling process
+    :param filename: CSV file the rows are written into as the points are finished
+    :param args: optional arguments of *ber_point*, ValueError is raised for the pulses
+                 other than rect
+    :return: list of result rows (dictionaries of RESULT_FIELDS) in the order of *ebn0_dbs*
+    """
+    logger = logging.getLogger(__name__)
+    _check_pulse(args.get('pulse', 'rect'))
+    seed_seq = np.random.SeedSequence(seed)
+    logger.debug("BER simulation, seed %s", seed_seq.entropy)
+    tasks = [(float(e), s, args) for e, s in zip(ebn0_dbs, seed_seq.spawn(len(ebn0_dbs)))]
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    workers = min(workers, max(len(tasks), 1))
+    logger.debug("BER simulation, %s points, %s workers", len(tasks), workers)
+
+    rows = []
+    csvfile = open(filename, 'w', newline='') if filename else None
+    try:
+        if csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            csvfile.flush()
+        for row in _completed(tasks, workers):
+            logger.debug("Eb/N0 %s dB, %s errors in %s bits", row["ebn0_db"], row["errors"],
+                         row["bits"])
+            rows.append(row)
+            if csvfile:
+                writer.writerow(row)
+                csvfile.flush()
+    finally:
+        if csvfile:
+            csvfile.close()
+    order = {float(e): i for i, e in enumerate(ebn0_dbs)}
+    return sorted(rows, key=lambda r: order[r["ebn0_db"]])
+
+
+def main(setup_data, analysis_setup):
+    logger = logging.getLogger(__name__)
+    points = analysis_setup["ber_ebn0_db"]
+    logger.info("BER simulation started, %s Eb/N0 points", len(points))
+    rows = ber_curve(points, analysis_setup["ber_seed"], analysis_setup["ber_workers"],
+                     setup_data["data_ber"], **analysis_setup["ber_args"])
+    logger.info("BER results written to %s", setup_data["data_ber"])
+    return rows
@@ -0,0 +1,102 @@
+"""
+Streaming receiver chain **Down-convertor -> Matched filter -> Hard decisions** working in
+blocks, the counterpart of *modulators.block_stream*. Memory use does not depend on the length
+of the received signal.
+
+The state carried from one block to the next one is
+
+* the phase of the carrier of the receiver, kept by the numerically controlled oscillator,
+* the samples of the symbols not received completely, kept by *symbol_detectors.MatchedFilter*.
+
+Samples are taken at the times ``k / f_sampl`` where *k* is the index of the sample in the
+whole stream, the same time axis as the one of the transmitter, so the passband blocks of
+*modulators.block_stream.signal_chain* are received directly.
+
+**Example:**
+
+>>> tx = bs.signal_chain(prn.ssrg_blocks(init, fb, 4096), s_rate, f_sampl, f0, 8192,
+...                      pulse='rcos', modulation='qpsk')
+>>> for bits in receiver_chain(tx, s_rate, f_sampl, f0, pulse='rcos', modulation='qpsk'):
+...     errors += np.count_nonzero(bits != expected_bits(bits.size))
+"""
+import logging
+
+from modulators import up_convertors as uc
+from demodulators import down_convertors as dc
+from demodulators import symbol_detectors as sd
+
+
+def downconvert_blocks(pb_blocks, f_sampl, f0, p0=0.0, pE=0.0, **args):
+    """
+    Down-converts a stream of passband blocks with a phase-continuous carrier, see
+    *down_convertors.nco_demod*
+
+    :param pb_blocks: iterable of real passband blocks
+    :param f_sampl: sampling rate
+    :param f0: carrier frequecy of real signal
+    :param p0: starting phase of the LO signal (phase disbalance)
+    :param pE:  phase error between LO and LO+pi/2 signals
+    :param args: optional arguments of the NCO (*method*, *lut_bits*, *block_size*)
+    :return: generator of complex baseband blocks
+    """
+    nco = uc.NCO(f0, f_sampl, p0, pE, 0.0, **args)
+    for x in pb_blocks:
+        yield dc.nco_demod(x, nco)
+
+
+def symbol_blocks(bb_blocks, s_rate, f_sampl, **args):
+    """
+    Matched filter outputs of a stream of baseband blocks
+
+    :param bb_blocks: iterable of complex baseband blocks
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param args: optional argument *pulse* (default rect) and the arguments of
+                 *symbol_detectors.MatchedFilter* (*tp*, *td*, *ts*, *pw*, *alpha*, *span*)
+    :return: generator of blocks of complex symbol outputs, one block per baseband block
+             which completes any symbol and the block of the last symbols
+    """
+    pulse_shape = args.pop('pulse', 'rect')
+    if pulse_shape != 'rect':
+        args.setdefault('span', 8)
+    mf = sd.MatchedFilter(pulse_shape, s_rate, f_sampl, **args)
+    for bb in bb_blocks:
+        z = mf.process(bb)
+        if z.size:
+            yield z
+    z = mf.flush()
+    if z.size:
+        yield z
+
+
+def bit_blocks(sym_blocks, modulation):
+    """
+    Hard decisions of a stream of symbol outputs, see *symbol_detectors.hard_decisions*
+
+    :return: generator of binary blocks of the type uint8
+    """
+    for z in sym_blocks:
+        yield sd.hard_decisions(z, modulation)
+
+
+def receiver_chain(pb_blocks, s_rate, f_sampl, f0, **args):
+    """
+    Complete streaming receiver, passband -> baseband -> symbols -> bits
+
+    :param pb_blocks: iterable of real passband blocks, e.g. *modulators.block_stream.signal_chain*
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param f0: carrier frequecy of real signal
+    :param args: optional arguments *modulation* (default bpsk), *p0*, *pE* of the LO (default
+                 0), *method*, *lut_bits* of the NCO and the arguments of *symbol_blocks*
+    :return: generator of binary blocks of the type uint8
+    """
+    logger = logging.getLogger(__name__)
+    modulation = args.pop('modulation', 'bpsk')
+    p0 = args.pop('p0', 0.0)
+    pE = args.pop('pE', 0.0)
+    nco_args = {k: args.pop(k) for k in ('method', 'lut_bits') if k in args}
+    logger.debug("streaming receiver, %s, carrier %s Hz, sampling %s Hz",
+                 modulation, f0, f_sampl)
+    bb = downconvert_blocks(pb_blocks, f_sampl, f0, p0, pE, **nco_args)
+    return bit_blocks(symbol_blocks(bb, s_rate, f_sampl, **args), modulation)
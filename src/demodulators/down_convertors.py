@@ -0,0 +1,70 @@
+"""
+Down-convertors of the real passband signal to the complex baseband signal, the counterparts
+of *modulators.up_convertors*.
+
+The passband signal ``x = I cos(a) + Q sin(a + pE)`` is multiplied by the LO signals of the
+receiver with the same phase error, ``2 x cos(a)`` gives ``I + Q sin(pE)`` and
+``2 x sin(a + pE)`` gives ``Q + I sin(pE)`` plus the components at twice the carrier
+frequency. The cross-talk of the branches is removed, I and Q are solved from the two outputs,
+``I = (y_I - y_Q sin(pE)) / cos(pE)**2`` and likewise Q. The image at 2 * f0 is not filtered
+here, it is rejected by the matched filter of *symbol_detectors* which follows the
+down-convertor.
+
+*quad_demod* converts a whole signal given by its time axis at once, *nco_demod* converts
+the next block of a streamed signal with the carrier of a numerically controlled oscillator,
+see *up_convertors.NCO*.
+"""
+import numpy as np
+
+
+def quad_demod(x, t, f0, p0, pE):
+    """
+    Quadrature demodulator.
+
+    :param x: passband signal, real
+    :param t: time axis vector
+    :param f0: carrier frequecy of real signal
+    :param p0: starting phase of the LO signal (phase disbalance)
+    :param pE:  phase error between LO and LO+pi/2 signals, the cross-talk it causes is removed
+    :return: baseband signal, complex, with the image at twice the carrier frequency
+    """
+
+    s_I = np.cos(2 * np.pi * f0 * t + p0)
+    s_Q = np.sin(2 * np.pi * f0 * t + p0 + pE)
+
+    bb = np.empty(np.shape(x), dtype=complex)
+    np.multiply(x, 2 * s_I, out=bb.real)
+    np.multiply(x, 2 * s_Q, out=bb.imag)
+    _remove_crosstalk(bb, pE)
+
+    return (bb)
+
+
+def nco_demod(x, nco):
+    """
+    Down-converts the next block of the passband signal, the phase of the carrier continues
+    from the previous block
+
+    :param x: block of the passband signal, real
+    :param nco: numerically controlled oscillator, *up_convertors.NCO*
+    :return: baseband signal, complex, with the image at twice the carrier frequency
+    """
+    s_I, s_Q = nco.carrier(np.size(x))
+    bb = np.empty(np.shape(x), dtype=complex)
+    np.multiply(x, 2 * s_I, out=bb.real)
+    np.multiply(x, 2 * s_Q, out=bb.imag)
+    _remove_crosstalk(bb, nco.pE)
+    return bb
+
+
+def _remove_crosstalk(bb, pE):
+    # y_I = I + Q sin(pE), y_Q = Q + I sin(pE) solved for I and Q in place
+    if not pE:
+        return
+    s = np.sin(pE)
+    c2 = np.cos(pE) ** 2
+    y_I = bb.real.copy()
+    bb.real -= s * bb.imag
+    bb.real /= c2
+    bb.imag -= s * y_I
+    bb.imag /= c2
@@ -0,0 +1,222 @@
+"""
+Matched filter, symbol-rate decimation and hard decisions of the receiver, the counterpart
+of *modulators.constallation_mappers*.
+
+The matched filter is the single pulse of *one_pulse* sampled on the sampling grid around
+the center of the symbol - the rectangular pulse of the width *tp*, the sinc or the raised
+cosine pulse truncated to *span* symbols. The taps are normalized, so a lone pulse of the
+level *a* gives the output *a* at its center and the outputs are directly comparable with
+the points of *constallation_mappers.CONSTELLATIONS*.
+
+Filtering and decimation are done in one step, the filter output is evaluated only at the
+symbol centers, each one as the dot product of the taps with the window of samples around
+the center, so the cost is O(symbols * taps) instead of O(samples * taps). The symbol centers
+are the times of the transmitter, ``td + tp / 2 + k * (tp + ts)`` for the rectangular pulses
+and ``td + k * tp`` for the others, rounded to the nearest sample. The taps are sampled at
+the offset of the first symbol from the grid, they match every symbol exactly when the
+sampling rate is a multiple of the symbol rate.
+
+The windows of the first and of the last symbols reach out of the signal, e.g. half of the
+taps of a sinc pulse centered on the first sample. Those outputs are divided by the part of
+the energy of the taps lying within the signal, so a pulse cut by the start or by the end of
+the signal still gives its level at the center and the decisions of the edge symbols are not
+biased towards zero.
+
+*MatchedFilter* processes the baseband signal in chunks of any length, the samples of the
+symbols not complete yet are carried to the next chunk. Hard decisions pick the nearest
+point of the constellation and return its group of bits, the inverse of *map_symbols*.
+"""
+import logging
+import numpy as np
+
+from siggens import one_pulse as pulse
+from modulators import constallation_mappers as cm
+
+
+def pulse_taps(pulse_shape, s_rate, f_sampl, **args):
+    """
+    Taps of the filter matched to a single pulse
+
+    :param pulse_shape: rect, sinc or rcos
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param args: optional arguments *tp*, *td*, *pw*, *alpha* of the mapper, see
+                 *constallation_mappers.lut_map*, and *span* (default 8) of the sinc and
+                 raised cosine pulses
+    :return: tuple (taps, t_center), the taps are centered on the middle one and normalized
+             to the unit response to the pulse, t_center is the center of the first symbol
+    """
+    dt = 1 / f_sampl
+    tp = args.get('tp', 1 / s_rate)
+    td = args.get('td', 0)
+    if pulse_shape == 'rect':
+        t_center = td + tp / 2
+        half = tp / 2
+    elif pulse_shape in ('sinc', 'rcos'):
+        t_center = td
+        half = args.get('span', 8) * tp / 2
+    else:
+        raise ValueError("Unknown pulse '%s', use 'rect', 'sinc' or 'rcos'" % pulse_shape)
+
+    # taps at the sample times around the nearest sample of the first symbol center
+    frac = np.rint(t_center * f_sampl) - t_center * f_sampl
+    n_half = int(np.ceil(half * f_sampl)) + 1
+    u = (np.arange(-n_half, n_half + 1) + frac) * dt
+    if pulse_shape == 'rect':
+        p = pulse.rect_p(u, -half, half).astype(float)
+    else:
+        u = u[np.abs(u) <= half * (1 + 1e-9)]
+        n_half = (u.size - 1) // 2
+        pw = args.get('pw', 1 / s_rate)
+        if pulse_shape == 'sinc':
+            p = pulse.sinc_p(u, 0.0, pw)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                p = pulse.rcos_p(u, 0.0, pw, args.get('alpha', .8))
+            # removable singularities of the damping factor, limit value pi/4
+            bad = ~np.isfinite(p)
+            p[bad] = pulse.sinc_p(u[bad], 0.0, pw) * np.pi / 4
+    if not np.any(p):
+        p[n_half] = 1.0  # pulse shorter than a sample, the center sample is taken
+    return p / np.dot(p, p), t_center
+
+
+class MatchedFilter:
+    """
+    Streaming matched filter with the decimation to the symbol rate
+
+    :param pulse_shape: rect, sinc or rcos
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param args: optional arguments of *pulse_taps* and *ts* of the rectangular pulses
+
+    **Example:**
+
+    >>> mf = MatchedFilter('rcos', s_rate=1e3, f_sampl=16e3, span=8)
+    >>> z = [mf.process(bb) for bb in baseband_blocks]
+    >>> z.append(mf.flush())
+    """
+
+    def __init__(self, pulse_shape, s_rate, f_sampl, **args):
+        logger = logging.getLogger(__name__)
+        self.taps, self.t_center = pulse_taps(pulse_shape, s_rate, f_sampl, **args)
+        tp = args.get('tp', 1 / s_rate)
+        self.period = tp + args.get('ts', 0) if pulse_shape == 'rect' else tp
+        self.f_sampl = f_sampl
+        self.half = (self.taps.size - 1) // 2
+        # energy of the taps 0 ... i - 1 relative to all the taps, the gains of the cut windows
+        energy = np.cumsum(self.taps ** 2)
+        self._energy = np.concatenate(([0.0], energy)) / energy[-1]
+        logger.debug("matched filter %s, %s taps, %s samples per symbol",
+                     pulse_shape, self.taps.size, self.period * f_sampl)
+        self.reset()
+
+    def reset(self):
+        """
+        Drops the carried samples, the next chunk is the start of a new signal
+        """
+        # samples before the start of the signal are zeros
+        pad = self.half + max(0, -int(self.centers(0)))
+        self._buf = np.zeros(pad, dtype=complex)
+        self._g0 = -pad  # sample index of _buf[0]
+        self._n_in = 0  # samples received
+        self._n_end = None  # length of the signal, known when flushed
+        self._k = 0  # next symbol
+
+    def centers(self, k):
+        """
+        Sample indices of the centers of the symbols *k*
+        """
+        return np.rint((self.t_center + np.asarray(k) * self.period) * self.f_sampl).astype(np.int64)
+
+    def _count(self, n):
+        # number of the symbols with the center at most at the sample n
+        k = max(int(np.floor(((n + 0.5) / self.f_sampl - self.t_center) / self.period)) + 1, 0)
+        while k > 0 and self.centers(k - 1) > n:
+            k -= 1
+        while self.centers(k) <= n:
+            k += 1
+        return k
+
+    def process(self, bb):
+        """
+        Filters the next chunk of the baseband signal
+
+        :param bb: chunk of the baseband signal
+        :return: complex outputs of the symbols whose samples are all received
+        """
+        bb = np.asarray(bb).ravel()
+        buf = np.concatenate((self._buf, bb))
+        self._n_in += bb.size
+        k_hi = self._count(self._n_in - 1 - self.half)
+        z = np.zeros(0, dtype=complex)
+        if k_hi > self._k:
+            start = self.centers(np.arange(self._k, k_hi)) - self.half - self._g0
+            windows = np.lib.stride_tricks.sliding_window_view(buf, self.taps.size)
+            z = windows[start] @ self.taps
+            self._scale_cut(z, start + self._g0)
+            self._k = k_hi
+        # only the samples of the following symbols are kept
+        g_next = min(int(self.centers(self._k)) - self.half, self._n_in)
+        self._buf = buf[max(g_next - self._g0, 0):].copy()
+        self._g0 = self._n_in - self._buf.size
+        return z
+
+    def _scale_cut(self, z, g_start):
+        # outputs of the windows starting at the samples g_start reaching out of the signal
+        n_end = self._n_end if self._n_end is not None else np.inf
+        lo = np.clip(-g_start, 0, self.taps.size)
+        hi = np.clip(n_end - g_start, 0, self.taps.size).astype(np.int64)
+        cut = (lo > 0) | (hi < self.taps.size)
+        if np.any(cut):
+            gain = self._energy[hi[cut]] - self._energy[lo[cut]]
+            z[cut] /= np.where(gain > 0, gain, 1.0)
+
+    def flush(self):
+        """
+        Outputs of the remaining symbols centered within the received signal, the filter is
+        then reset
+        """
+        self._n_end = self._n_in
+        k_end = self._count(self._n_in - 1)
+        k0 = self._k
+        z = self.process(np.zeros(self.half))[:max(k_end - k0, 0)]
+        self.reset()
+        return z
+
+
+def matched_filter(bb, s_rate, f_sampl, **args):
+    """
+    Matched filter outputs of all the symbols of a whole baseband signal, see *MatchedFilter*
+
+    :param bb: baseband signal, sampled at the times k / f_sampl
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param args: optional argument *pulse* (default rect) and the arguments of *MatchedFilter*
+    :return: complex outputs, one per symbol centered within the signal
+    """
+    pulse_shape = args.pop('pulse', 'rect')
+    mf = MatchedFilter(pulse_shape, s_rate, f_sampl, **args)
+    return np.concatenate((mf.process(bb), mf.flush()))
+
+
+def hard_decisions(z, modulation):
+    """
+    Maps the matched filter outputs to the nearest points of the constellation and back to bits
+
+    :param z: complex matched filter outputs
+    :param modulation: bpsk, qpsk, 8psk or 16qam, see *constallation_mappers.CONSTELLATIONS*
+    :return: binary sequence of the type uint8, *bits_per_symbol* bits per output
+    """
+    table = cm.CONSTELLATIONS[modulation]
+    k = cm.bits_per_symbol(modulation)
+    z = np.ravel(z)
+    best = np.zeros(z.size, dtype=np.intp)
+    d_best = np.abs(z - table[0])
+    for i in range(1, table.size):
+        d = np.abs(z - table[i])
+        closer = d < d_best
+        best[closer] = i
+        d_best[closer] = d[closer]
+    bits = (best[:, np.newaxis] >> np.arange(k - 1, -1, -1)) & 1
+    return bits.astype(np.uint8).ravel()
@@ -1,29 +1,387 @@
+"""
+Correlation functions based on NumPy.
+
+*corr_fd* computes the circular correlation in the frequency domain. Real inputs are
+transformed by real FFTs, the spectrum of the second operand (the reference or replica code)
+is kept in a small cache, so correlating many received blocks against one replica transforms
+the replica only once. Lengths with a large prime factor are zero-padded to a length which
+factors well and the linear correlation is folded back into the circular one.
+
+*acquisition_search* correlates one received block against a bank of replica codes and a
+set of Doppler bins in a single vectorized call, returning the delay x Doppler x PRN surface
+or only its peak statistics.
+
+*family_corr* computes the periodic cross-correlations of every pair of a family of binary
+codes (e.g. Gold or Kasami codes) at every lag. Short codes are correlated bit-packed, the
++/-1 correlation equals the code length minus twice the number of differing chips, which is
+counted by XOR and popcount of 64-bit words. The rotations of the codes are cut out of the
+packed words of the doubled codes, the memory of the packed backend grows only with the
+number of the correlations. Long codes are correlated by real FFTs of all the codes at once.
+"""
+import hashlib
+import functools
+from collections import OrderedDict
 
 import numpy as np
 import numpy.fft as npfft
-import scipy.signal as signal
 import logging
 
+# number of reference spectra kept by corr_fd
+SPECTRUM_CACHE_SIZE = 16
+# lengths with a prime factor above this limit are padded to a fast length
+MAX_PRIME_FACTOR = 64
+# family_corr uses the bit-packed backend for codes up to this length, longer codes are
+# correlated faster by FFTs, the packed backend itself works for any length
+PACKED_MAX_LENGTH = 128
+
+_spectrum_cache = OrderedDict()
+
 
 def corr_td_single (x1,x2):
     c_12 = np.dot(x1,x2)
     return c_12
 
 
-def corr_fd(x1,x2):
+def corr_fd(x1, x2, **args):
+    """
+    Circular correlation of two signals computed by FFT, c[k] = sum x1[n + k] * conj(x2[n])
+
+    :param x1: signal, e.g. the received block
+    :param x2: reference signal, e.g. the replica code
+    :param args: optional arguments *cache* (default True), keep the spectrum of *x2* for the
+                 following calls, and *fast_len* (default True), pad lengths with a large
+                 prime factor to a length which factors well
+    :return: correlation of the length of the longer operand, real for real operands
+    """
     logger = logging.getLogger(__name__)
-    logger.debug("Numpy based correlation function called, using fft and ifft from numpy.fft")
-    x1_f = npfft.fft(x1)
-    x2_f = npfft.fft(x2)
-    logger.debug("operand x1: %s, %s, %s", np.shape(x1_f), type(x1_f), np.max(x1_f))
-    logger.debug("operand x2: %s, %s, %s", np.shape(x2_f), type(x2_f), np.max(x2_f))
-    c_f = x1_f * np.conjugate(x2_f)
-    logger.debug("result in freq-domain: %s, %s, %s", np.shape(c_f), type(c_f), np.max(c_f))
-    c = npfft.ifft(c_f)
-    logger.debug("result in time-domain after ifft: %s, %s, %s", np.shape(c), type(c), np.max(c))
+    n = max(np.size(x1), np.size(x2))
+    real = np.isrealobj(x1) and np.isrealobj(x2)
+    if 'fast_len' in args and not args['fast_len']:
+        nfft = n
+    else:
+        nfft = fft_length(n, real)
+    if 'cache' in args:
+        cache = bool(args['cache'])
+    else:
+        cache = True
+    logger.debug("Numpy based correlation function called, %s samples, fft length %s, real %s",
+                 n, nfft, real)
+
+    x1_f = _spectrum(x1, nfft, real)
+    if cache:
+        x2_fc = reference_spectrum(x2, nfft, real)
+    else:
+        x2_fc = np.conjugate(_spectrum(x2, nfft, real))
+    c_f = x1_f * x2_fc
+    if real:
+        c = npfft.irfft(c_f, nfft)
+    else:
+        c = npfft.ifft(c_f, nfft)
+    if nfft != n:
+        c = fold_circular(c, n)
+    logger.debug("result in time-domain: %s, %s", np.shape(c), c.dtype)
     return c
 
 
+def acquisition_search(x, replicas, dopplers, f_sampl, **args):
+    """
+    Correlates a received block with every replica code shifted by every Doppler frequency
+
+    The Doppler bins are wiped off the received block, all the shifted blocks and all the
+    replicas are transformed once and the correlations are computed by a stacked inverse FFT
+    of the broadcast products. At most *batch_size* correlations are held in memory at once.
+
+    :param x: received block, real or complex
+    :param replicas: replica codes, array of the shape (number of PRNs, samples) or a single
+                     replica of the shape (samples,)
+    :param dopplers: Doppler frequencies searched
+    :param f_sampl: sampling rate
+    :param args: optional arguments, see the table.
+
+    +------------+-------------+-----------+---------------------------------------------------+
+    | Key word   | Possible    | Default   | Description                                       |
+    |            | values      |           |                                                   |
+    +============+=============+===========+===================================================+
+    | batch_size | positive    |   64      |  number of correlations (PRN, Doppler pairs) held |
+    |            | int         |           |  in memory at once                                |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | peaks_only | True/False  |   False   |  return only peak statistics of every PRN         |
+    +------------+-------------+-----------+---------------------------------------------------+
+
+    :return: correlation power |c|**2 of the shape (PRNs, Dopplers, delays), delay k as in
+             *corr_fd*, or when *peaks_only* a dictionary of arrays indexed by the PRN with
+             keys *peak* (the largest power), *delay* (its delay in samples), *doppler* (its
+             Doppler frequency), *doppler_index* and *ratio* (peak to mean power)
+    """
+    logger = logging.getLogger(__name__)
+    if 'batch_size' in args:
+        batch_size = max(int(args['batch_size']), 1)
+    else:
+        batch_size = 64
+    if 'peaks_only' in args:
+        peaks_only = bool(args['peaks_only'])
+    else:
+        peaks_only = False
+
+    x = np.ravel(x)
+    replicas = np.atleast_2d(replicas)
+    dopplers = np.atleast_1d(np.asarray(dopplers, dtype=float))
+    n = max(x.size, replicas.shape[-1])
+    n_prn = replicas.shape[0]
+    n_dopp = dopplers.size
+    nfft = fft_length(n, False)
+    logger.debug("acquisition search, %s PRNs x %s Dopplers x %s delays, fft length %s",
+                 n_prn, n_dopp, n, nfft)
+
+    t = np.arange(x.size) / f_sampl
+    r_fc = reference_spectrum(replicas, nfft, False)
+
+    if peaks_only:
+        peak = np.full(n_prn, -np.inf)
+        delay = np.zeros(n_prn, dtype=int)
+        d_idx = np.zeros(n_prn, dtype=int)
+        total = np.zeros(n_prn)
+    else:
+        surface = np.empty((n_prn, n_dopp, n))
+
+    # a batch is a block of Dopplers x PRNs holding at most batch_size correlations
+    p_step = min(n_prn, batch_size)
+    d_step = max(batch_size // n_prn, 1)
+    for d0 in range(0, n_dopp, d_step):
+        dd = np.arange(d0, min(d0 + d_step, n_dopp))
+        wipe = np.exp(-2j * np.pi * dopplers[dd, np.newaxis] * t)
+        x_f = npfft.fft(x * wipe, nfft, axis=-1)
+        for p0 in range(0, n_prn, p_step):
+            pp = slice(p0, min(p0 + p_step, n_prn))
+            c = npfft.ifft(r_fc[np.newaxis, pp] * x_f[:, np.newaxis], nfft, axis=-1)
+            if nfft != n:
+                c = fold_circular(c, n)
+            pw = (c.real ** 2 + c.imag ** 2).transpose(1, 0, 2)  # PRNs x Dopplers x delays
+            if not peaks_only:
+                surface[pp, dd] = pw
+                continue
+            flat = pw.reshape(pw.shape[0], -1)
+            k = np.argmax(flat, axis=-1)
+            m = flat[np.arange(flat.shape[0]), k]
+            total[pp] += np.sum(flat, axis=-1)
+            better = m > peak[pp]
+            idx = np.arange(p0, p0 + flat.shape[0])[better]
+            peak[idx] = m[better]
+            d_idx[idx] = dd[k[better] // n]
+            delay[idx] = k[better] % n
+
+    if not peaks_only:
+        return surface
+    mean = total / (n_dopp * n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = peak / mean
+    return {"peak": peak,
+            "delay": delay,
+            "doppler": dopplers[d_idx],
+            "doppler_index": d_idx,
+            "ratio": ratio}
+
+
+def family_corr(codes, **args):
+    """
+    Periodic correlations of all the pairs of a family of binary codes at all the lags
+
+    Chips are mapped to +/-1 (False -> 1, True -> -1), the correlation of the codes *i* and
+    *j* at the lag *k* is R[i, j, k] = sum a_i[n + k] * a_j[n] as in *corr_fd*. Only the pairs
+    j >= i are computed, the others follow from R[j, i, k] = R[i, j, -k].
+
+    :param codes: binary codes of the same length, array of the shape (codes, chips)
+    :param args: optional arguments, see the table.
+
+    +------------+-------------+-----------+---------------------------------------------------+
+    | Key word   | Possible    | Default   | Description                                       |
+    |            | values      |           |                                                   |
+    +============+=============+===========+===================================================+
+    | backend    | auto,       |   auto    |  'packed' XOR and popcount of packed chips,       |
+    |            | packed, fft |           |  'fft' real FFTs, 'auto' packed for codes up to   |
+    |            |             |           |  PACKED_MAX_LENGTH chips                          |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | maxima     | True/False  |   False   |  return only the largest |R| of every pair         |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | batch_size | positive    |   4096    |  number of correlations (pairs) held in memory    |
+    |            | int         |           |  at once                                          |
+    +------------+-------------+-----------+---------------------------------------------------+
+
+    :return: integer array R of the shape (codes, codes, chips), or when *maxima* the array of
+             the shape (codes, codes) of max_k |R[i, j, k]|, the diagonal holds the peak
+             sidelobes of the autocorrelations (the lag 0 is left out)
+    """
+    logger = logging.getLogger(__name__)
+    codes = np.atleast_2d(np.asarray(codes)).astype(bool)
+    n_codes, n = codes.shape
+    backend = args.get('backend', 'auto')
+    if backend == 'auto':
+        backend = 'packed' if n <= PACKED_MAX_LENGTH else 'fft'
+    if backend not in ('packed', 'fft'):
+        raise ValueError("Unknown correlation backend '%s', use 'auto', 'packed' or 'fft'" % backend)
+    maxima = bool(args.get('maxima', False))
+    batch_size = max(int(args.get('batch_size', 4096)), 1)
+    logger.debug("family correlation, %s codes x %s chips, backend %s", n_codes, n, backend)
+
+    if backend == 'packed':
+        words = _pack_words(codes)
+    else:
+        nfft = fft_length(n, True)
+        spec = npfft.rfft(1.0 - 2.0 * codes, nfft, axis=-1)
+
+    if maxima:
+        out = np.zeros((n_codes, n_codes), dtype=np.int64)
+    else:
+        out = np.zeros((n_codes, n_codes, n), dtype=np.int64)
+    neg = -np.arange(n) % n
+    step = max(batch_size // max(n_codes, 1), 1)
+    for i0 in range(0, n_codes, step):
+        i1 = min(i0 + step, n_codes)
+        if backend == 'packed':
+            # all the rotations of the codes of the batch, rot[b, w, k] holds the word w of
+            # a_i[n + k], the XOR and the counts of one word are written into reused buffers
+            rot = np.ascontiguousarray(_packed_rotations(codes[i0:i1]).transpose(0, 2, 1))
+            x = np.empty((i1 - i0, n_codes - i0, n), dtype=np.uint64)
+            diff = np.zeros(x.shape, dtype=np.int32)
+            for w in range(words.shape[-1]):
+                np.bitwise_xor(rot[:, np.newaxis, w], words[np.newaxis, i0:, w, np.newaxis], out=x)
+                diff += _popcount(x)
+            r = n - 2 * diff.astype(np.int64)
+        else:
+            c = npfft.irfft(spec[i0:i1, np.newaxis] * np.conjugate(spec[np.newaxis, i0:]), nfft,
+                            axis=-1)
+            if nfft != n:
+                c = fold_circular(c, n)
+            r = np.rint(c).astype(np.int64)
+        # r[b, j - i0, k] = R[i0 + b, j, k]
+        if maxima:
+            a = np.abs(r)
+            for b in range(i1 - i0):
+                a[b, b, 0] = 0  # the main peak of the autocorrelation
+            m = a.max(axis=-1)
+            out[i0:i1, i0:] = m
+            out[i0:, i0:i1] = m.T
+        else:
+            out[i0:i1, i0:] = r
+            out[i0:, i0:i1] = r.transpose(1, 0, 2)[..., neg]
+    return out
+
+
+def _pack_words(bits):
+    # packs the last axis into 64-bit words, the padding bits are zero
+    n = bits.shape[-1]
+    n_words = (n + 63) // 64
+    pad = np.zeros(bits.shape[:-1] + (n_words * 64 - n,), dtype=bool)
+    packed = np.packbits(np.concatenate((bits, pad), axis=-1), axis=-1)
+    return packed.view(np.uint64)
+
+
+def _packed_rotations(codes):
+    # packed words of all the cyclic rotations, rot[b, k] holds the chips k ... k + n - 1 of
+    # the code b repeated twice. The doubled code is packed once for each of the 8 bit offsets,
+    # the rotation by k is the window of bytes starting at k // 8 of the offset k % 8, so no
+    # unpacked (codes, chips, chips) array is built
+    n_codes, n = codes.shape
+    n_bytes = 8 * ((n + 63) // 64)
+    doubled = np.concatenate((codes, codes, np.zeros((n_codes, 64), dtype=bool)), axis=-1)
+    offsets = np.stack([np.packbits(doubled[:, r:r + 2 * n + 56], axis=-1) for r in range(8)],
+                       axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(offsets, n_bytes, axis=-1)
+    k = np.arange(n)
+    rot = np.ascontiguousarray(windows[:, k % 8, k // 8]).view(np.uint64)
+    return rot & _pack_words(np.ones(n, dtype=bool))  # the padding bits are zero
+
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return np.bitwise_count(words)
+else:
+    _POPCOUNT_8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        counts = _POPCOUNT_8[words.view(np.uint8)]
+        return counts.reshape(words.shape + (8,)).sum(axis=-1)
+
+
+@functools.lru_cache(maxsize=256)
+def fft_length(n, real=True):
+    """
+    Length of the FFT used for the circular correlation of *n* samples
+
+    :param n: number of samples
+    :param real: True for real FFTs
+    :return: *n* itself when it factors well, otherwise a fast length of at least 2 * n - 1
+    """
+    if n < 2 or _largest_prime_factor(n) <= MAX_PRIME_FACTOR:
+        return n
+    import scipy.fft as spfft  # imported on use, only the lengths with large prime factors need it
+    return spfft.next_fast_len(2 * n - 1, real=real)
+
+
+def fold_circular(c, n):
+    """
+    Folds a linear correlation stored circularly in *c* into the circular correlation of
+    the length *n*, requires np.size(c) >= 2 * n - 1
+
+    :param c: linear correlation, lag k at the index k mod np.size(c)
+    :param n: length of the circular correlation
+    :return: circular correlation
+    """
+    nfft = np.shape(c)[-1]
+    out = c[..., :n].copy()
+    out[..., 1:] += c[..., nfft - n + 1:]
+    return out
+
+
+def reference_spectrum(x, nfft, real):
+    """
+    Conjugated spectrum of a reference signal, taken from the cache when the same signal
+    was already transformed
+
+    :param x: reference signal
+    :param nfft: length of the FFT
+    :param real: True for real FFTs
+    :return: conjugated spectrum, read-only array
+    """
+    x = np.ascontiguousarray(x)
+    key = (hashlib.blake2b(x.view(np.uint8), digest_size=16).digest(),
+           x.dtype.str, x.shape, nfft, real)
+    if key in _spectrum_cache:
+        _spectrum_cache.move_to_end(key)
+        return _spectrum_cache[key]
+    x_fc = np.conjugate(_spectrum(x, nfft, real))
+    x_fc.setflags(write=False)
+    _spectrum_cache[key] = x_fc
+    while len(_spectrum_cache) > SPECTRUM_CACHE_SIZE:
+        _spectrum_cache.popitem(last=False)
+    return x_fc
+
+
+def clear_spectrum_cache():
+    """
+    Drops all the cached reference spectra
+    """
+    _spectrum_cache.clear()
+
+
+def _spectrum(x, nfft, real):
+    if real:
+        return npfft.rfft(x, nfft)
+    return npfft.fft(x, nfft)
+
+
+def _largest_prime_factor(n):
+    p = 1
+    f = 2
+    while f * f <= n:
+        while n % f == 0:
+            p = f
+            n //= f
+        f += 1
+    return max(p, n)
+
+
 def corr_CORR(x1,x2):
+    import scipy.signal as signal  # imported on use, scipy.signal is slow to import
     c = signal.correlate(x1,x2,'full')
     return c
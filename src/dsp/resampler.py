@@ -0,0 +1,158 @@
+"""
+Rational-ratio polyphase resampling of baseband or passband signals.
+
+The signal sampled at *f_sampl* is converted to the rate *f_sampl * up / down*. Conceptually
+the signal is upsampled by zero stuffing, low-pass filtered and decimated, the polyphase form
+of *scipy.signal.upfirdn* evaluates only the filter branch and the input samples needed for
+each output sample, so the cost is O(outputs * taps / up). The low-pass filter is the one of
+*scipy.signal.resample_poly*
+(Kaiser window, 10 zero crossings on each side), the one-shot *resample* returns the same
+signal as *resample_poly*.
+
+*PolyphaseResampler* processes the signal in chunks of any length, the tail of the input and
+the phase of the decimator are carried from one chunk to the next one, so the joined outputs
+equal the output of the whole signal resampled at once.
+"""
+import logging
+from fractions import Fraction
+
+import numpy as np
+import scipy.signal as signal
+
+
+def resample_ratio(f_in, f_out, max_den=1000):
+    """
+    Rational approximation of the ratio of two sampling rates
+
+    :param f_in: sampling rate of the input
+    :param f_out: required sampling rate of the output
+    :param max_den: the largest accepted down factor
+    :return: tuple (up, down) of coprime integers, f_out ~ f_in * up / down
+    """
+    r = Fraction(f_out / f_in).limit_denominator(max_den)
+    return r.numerator, r.denominator
+
+
+class PolyphaseResampler:
+    """
+    Streaming resampler by the rational factor *up* / *down*
+
+    :param up: upsampling factor
+    :param down: downsampling factor
+    :param args: optional arguments *window* (default ('kaiser', 5.0)) of the low-pass filter
+                 design, see *scipy.signal.firwin*, *h*, a filter designed by the caller (its
+                 gain has to be *up*), and *align* (default True), drops the first *delay*
+                 output samples, so the output starts at the time of the first input sample
+
+    **Example:**
+
+    >>> rs = PolyphaseResampler(3, 2)       # 24 kHz -> 36 kHz
+    >>> out = [rs.process(block) for block in baseband_blocks]
+    >>> out.append(rs.flush())
+    """
+
+    def __init__(self, up, down, **args):
+        logger = logging.getLogger(__name__)
+        g = np.gcd(int(up), int(down))
+        self.up = int(up) // g
+        self.down = int(down) // g
+        max_rate = max(self.up, self.down)
+        if 'h' in args:
+            h = np.asarray(args['h'], dtype=float)
+            half_len = (h.size - 1) // 2
+        elif max_rate == 1:
+            h = np.ones(1)  # equal rates, the signal passes unchanged
+            half_len = 0
+        else:
+            window = args['window'] if 'window' in args else ('kaiser', 5.0)
+            half_len = 10 * max_rate
+            h = signal.firwin(2 * half_len + 1, 1 / max_rate, window=window) * self.up
+        # zeros in front of the filter make its delay a whole number of output samples
+        n_pre_pad = self.down - half_len % self.down
+        h = np.concatenate((np.zeros(n_pre_pad), h))
+        self.delay = (half_len + n_pre_pad) // self.down
+        self.align = bool(args['align']) if 'align' in args else True
+
+        self._h = h
+        self.h_size = h.size
+        self.n_taps = -(-h.size // self.up)  # input samples reached by one output sample
+        # kept input, enough for the first window of the next chunk aligned to down samples
+        self._keep = self.n_taps - 1 + self.down
+        logger.debug("polyphase resampler %s/%s, %s taps per branch, delay %s samples",
+                     self.up, self.down, self.n_taps, self.delay)
+        self.reset()
+
+    def reset(self):
+        """
+        Drops the carried state, the next chunk is the start of a new signal
+        """
+        self._history = np.zeros(self._keep)  # the inputs before the start are zeros
+        self._n_in = 0  # input samples processed
+        self._m = 0  # index of the next output sample of the full convolution
+        self._skip = self.delay if self.align else 0
+
+    def process(self, x):
+        """
+        Resamples the next chunk of the signal
+
+        :param x: chunk of the signal, real or complex
+        :return: output samples which depend only on the input received so far
+        """
+        x = np.asarray(x).ravel()
+        if x.size == 0:
+            return x[:0]
+        buf = np.concatenate((self._history.astype(np.result_type(self._history, x)), x))
+        n_end = self._n_in + x.size  # the output m needs the inputs up to floor(m * down / up)
+        m_end = -(-n_end * self.up // self.down)  # first output which needs a future input
+        # the buffer is filtered from the sample s, a multiple of down, there the phase of the
+        # decimator of upfirdn agrees with the global one, output m is then m - s * up / down
+        g0 = self._n_in - self._history.size  # global index of buf[0]
+        s0 = -(-g0 // self.down) * self.down
+        y_buf = signal.upfirdn(self._h, buf[s0 - g0:], self.up, self.down)
+        m_s = s0 // self.down * self.up
+        y = y_buf[self._m - m_s:m_end - m_s]
+
+        self._m = m_end
+        self._n_in = n_end
+        self._history = buf[buf.size - self._keep:]
+        if self._skip:
+            drop = min(self._skip, y.size)
+            self._skip -= drop
+            y = y[drop:]
+        return y
+
+    def flush(self):
+        """
+        Output samples of the tail of the filter after the last input sample, the resampler
+        is then reset
+
+        :return: with *align* the samples completing the output to ceil(inputs * up / down)
+                 samples, otherwise the tail of the full convolution
+        """
+        n_in = self._n_in
+        if self.align:
+            n_total = -(-n_in * self.up // self.down) + self.delay
+        else:
+            n_total = -(-((n_in - 1) * self.up + self.h_size) // self.down) if n_in else 0
+        m0 = self._m
+        skip = self._skip  # outputs of the start of the signal still to be dropped
+        self._skip = 0
+        y = self.process(np.zeros(self.n_taps + self.down // self.up + 1))
+        y = y[:max(n_total - m0, 0)][skip:]
+        self.reset()
+        return y
+
+
+def resample(x, up, down, **args):
+    """
+    Resamples a whole signal by the rational factor *up* / *down*, see *PolyphaseResampler*
+
+    :param x: signal, real or complex
+    :param up: upsampling factor
+    :param down: downsampling factor
+    :param args: optional arguments of *PolyphaseResampler*
+    :return: signal of ceil(np.size(x) * up / down) samples
+    """
+    args['align'] = True
+    rs = PolyphaseResampler(up, down, **args)
+    return np.concatenate((rs.process(x), rs.flush()))
@@ -0,0 +1,172 @@
+"""
+Streaming signal chain **PRN generator -> Constallation Mapper -> Up-convertor** working in
+blocks of a fixed size. Memory use does not depend on the length of the generated signal.
+
+The state carried from one block to the next one is
+
+* the state of the code generator, kept by the generators *ssrg_blocks* or *gold_blocks*
+  of the module *PRN_bitstreams*,
+* the tails of the pulses, a short buffer of the chips around the current block, so the
+  pulses of the neighbouring symbols reaching into the block are taken into account,
+* the phase of the carrier, kept by the numerically controlled oscillator.
+
+Sinc and raised cosine pulses are truncated to *span* symbols (default 8), see
+*train_pulse*. Samples are taken at the times ``k * (1 / f_sampl)`` where *k* is the index of the
+sample in the whole stream, the same time axis as ``np.arange(0, T, 1 / f_sampl)``. Every
+block is mapped with the index of its first symbol in the whole stream (*first_symbol* of
+*lut_map*), the edges of the rectangular pulses are computed from the same symbol indices as
+in the signal mapped at once, so the joined blocks equal that signal for any block size.
+"""
+import numpy as np
+import logging
+from modulators import constallation_mappers as cm
+from modulators import up_convertors as uc
+
+BITS_PER_SYMBOL = {m: cm.bits_per_symbol(m) for m in cm.CONSTELLATIONS}
+
+
+def baseband_blocks(chip_blocks, s_rate, f_sampl, block_size, **args):
+    """
+    Maps a stream of chip blocks into a stream of baseband blocks
+
+    :param chip_blocks: iterable of binary sequences, e.g. *PRN_bitstreams.ssrg_blocks*
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param block_size: number of samples in one baseband block
+    :param args: optional arguments, see the table.
+
+    +------------+-------------+-----------+---------------------------------------------------+
+    | Key word   | Possible    | Default   | Description                                       |
+    |            | values      |           |                                                   |
+    +============+=============+===========+===================================================+
+    | pulse      | rect, sinc, |   rect    |  shape of the pulse                               |
+    |            | rcos        |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | modulation | bpsk, qpsk, |   bpsk    |  table of the constellation, see                  |
+    |            | 8psk, 16qam |           |  *constallation_mappers.CONSTELLATIONS*           |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | span       | positive    |   8       |  length of the truncated sinc or raised cosine    |
+    |            | float       |           |  pulse in symbols                                 |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | reuse      | True/False  |   False   |  every block is written into the same buffer, a   |
+    |            |             |           |  block is valid until the next one is requested   |
+    +------------+-------------+-----------+---------------------------------------------------+
+
+    Other optional arguments (*tp*, *td*, *ts*, *pw*, *alpha*, *dtype*) are passed to the
+    mapper, see *constallation_mappers.lut_map*.
+
+    :return: generator of complex baseband blocks of the length *block_size*, the last block
+             is shorter when the chip stream ends
+    """
+    logger = logging.getLogger(__name__)
+    pulse = args.pop('pulse', 'rect')
+    modulation = args.pop('modulation', 'bpsk')
+    reuse = bool(args.pop('reuse', False))
+    bps = BITS_PER_SYMBOL[modulation]
+    if pulse != 'rect':
+        args.setdefault('span', 8)
+
+    tp = args.get('tp', 1 / s_rate)
+    td = args.get('td', 0)
+    ts = args.get('ts', 0) if pulse == 'rect' else 0
+    period = tp + ts  # symbol period
+    if pulse == 'rect':
+        reach = int(np.ceil(tp / period)) + 1  # symbols overlapping a sample
+    else:
+        reach = int(np.ceil(args['span'] / 2)) + 1
+    dt = 1 / f_sampl
+    logger.debug("streaming baseband, %s %s, block %s samples, pulse reach %s symbols",
+                 pulse, modulation, block_size, reach)
+
+    buffer = np.empty(block_size, dtype=args.get('dtype', complex)) if reuse else None
+    chips = iter(chip_blocks)
+    buf = np.zeros(0, dtype=bool)  # chips buf_start ... buf_start + buf.size - 1
+    buf_start = 0
+    exhausted = False
+    s0 = 0
+    while True:
+        t = np.arange(s0, s0 + block_size) * dt
+        sym_lo = max(int(np.floor((t[0] - td) / period)) - reach, 0)
+        sym_hi = int(np.floor((t[-1] - td) / period)) + reach + 1  # exclusive
+        while not exhausted and buf_start + buf.size < sym_hi * bps:
+            try:
+                buf = np.concatenate((buf, np.asarray(next(chips), dtype=bool)))
+            except StopIteration:
+                exhausted = True
+        if exhausted and sym_lo * bps >= buf_start + buf.size:
+            return
+        # drop the chips no longer needed
+        drop = sym_lo * bps - buf_start
+        buf = buf[drop:]
+        buf_start += drop
+
+        if exhausted:
+            # the stream ends with the end of the last symbol
+            n_sym = (buf_start + buf.size + bps - 1) // bps
+            t = t[:max(_stream_length(n_sym, td, period, f_sampl) - s0, 0)]
+            if t.size == 0:
+                return
+        data = buf[:(sym_hi - sym_lo) * bps]
+        margs = dict(args)
+        margs['first_symbol'] = sym_lo
+        if reuse:
+            margs['out'] = buffer[:t.size]
+        yield cm.lut_map(t, data, s_rate, pulse=pulse, modulation=modulation, **margs)
+        s0 += block_size
+
+
+def _stream_length(n_sym, td, period, f_sampl):
+    # number of the samples k * (1 / f_sampl) before the end td + n_sym * period of the last symbol,
+    # the samples per symbol and the samples of the delay close to whole numbers are taken as
+    # integers, so the length does not depend on the rounding of the end time
+    def samples(x):
+        r = np.rint(x)
+        return int(r) if abs(x - r) <= 1e-9 * max(abs(x), 1) else x
+
+    sps = samples(period * f_sampl)
+    n_td = samples(td * f_sampl)
+    if isinstance(sps, int) and isinstance(n_td, int):
+        return n_td + n_sym * sps
+    return int(np.ceil(n_td + n_sym * sps))
+
+
+def passband_blocks(bb_blocks, f_sampl, f0, p0, pE, jtr, **args):
+    """
+    Up-converts a stream of baseband blocks with a phase-continuous carrier of the
+    numerically controlled oscillator, see *up_convertors.NCO*
+
+    :param bb_blocks: iterable of complex baseband blocks
+    :param f_sampl: sampling rate
+    :param f0: carrier frequecy of real signal
+    :param p0: starting phase of the LO signal (phase disbalance)
+    :param pE:  phase error between LO and LO+pi/2 signals
+    :param jtr: sampling jitter (percent of sample period)
+    :param args: optional arguments of the NCO (*method*, *lut_bits*, *block_size*, *rng*)
+    :return: generator of passband blocks
+    """
+    nco = uc.NCO(f0, f_sampl, p0, pE, jtr, **args)
+    for bb in bb_blocks:
+        yield nco.modulate(bb)
+
+
+def signal_chain(chip_blocks, s_rate, f_sampl, f0, block_size, **args):
+    """
+    Complete streaming transmitter, chips -> baseband -> passband
+
+    :param chip_blocks: iterable of binary sequences, e.g. *PRN_bitstreams.ssrg_blocks*
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param f_sampl: sampling rate
+    :param f0: carrier frequecy of real signal
+    :param block_size: number of samples in one block
+    :param args: optional arguments of *baseband_blocks*, *p0*, *pE*, *jtr* of *quad_mod*
+                 (all default 0) and *method*, *lut_bits*, *rng* of the NCO, the baseband
+                 blocks are written into one reused buffer
+    :return: generator of passband blocks
+    """
+    p0 = args.pop('p0', 0)
+    pE = args.pop('pE', 0)
+    jtr = args.pop('jtr', 0)
+    nco_args = {k: args.pop(k) for k in ('method', 'lut_bits', 'rng') if k in args}
+    args.setdefault('reuse', True)  # every baseband block is up-converted before the next one
+    bb = baseband_blocks(chip_blocks, s_rate, f_sampl, block_size, **args)
+    return passband_blocks(bb, f_sampl, f0, p0, pE, jtr, **nco_args)
@@ -2,10 +2,20 @@
 Functions of the module **Constallation Mapper** produce baseband signals
 according to required passband modulations and shape of the pulse.
 
-At this moment available choices are BPSK or QPSK modulations and three
+At this moment available choices are BPSK, QPSK, 8-PSK or 16-QAM modulations and three
 different pulses - rectangular, sinus cardinale or raised cosine.
 
-Returned *baseband* signals are numpy arrays of the same size as the time axis *t*.
+Symbols are mapped by lookup tables, see *CONSTELLATIONS*. Groups of bits are packed into
+table indices and gathered into complex symbols at once by *map_symbols*. The I and Q levels
+of the symbols are shaped by a single pass of the pulse train, every pulse is evaluated once
+for both components, see *lut_map*. The BPSK and QPSK mappers below are *lut_map* with the
+particular table and pulse.
+
+Returned *baseband* signals are numpy arrays of the same size as the time axis *t*. The I
+and Q components are written directly into the real and imaginary parts of one complex
+array, every mapper accepts the optional arguments *dtype* (complex128 by default or
+complex64) and *out*, a preallocated complex array the signal is written into, e.g. the
+buffer reused by a streaming caller for every block.
 """
 # import sys
 # sys.path.append("../../srcpy")
@@ -13,6 +23,173 @@ Returned *baseband* signals are numpy arrays of the same size as the time axis *
 import numpy as np
 from siggens import train_pulse as gen
 
+
+def _gray(n_bits):
+    # Gray code of the positions 0 ... 2**n_bits - 1
+    pos = np.arange(2 ** n_bits)
+    return pos ^ (pos >> 1)
+
+
+def _psk_table(n_bits):
+    # Gray coded points on the unit circle, the table index is the bit group
+    table = np.zeros(2 ** n_bits, dtype=complex)
+    table[_gray(n_bits)] = np.exp(2j * np.pi * np.arange(2 ** n_bits) / 2 ** n_bits)
+    return table
+
+
+def _qam_table(n_bits):
+    # square QAM, the first half of the bit group selects the Gray coded I level, the second
+    # half the Q level, levels -(m - 1), ..., -1, 1, ..., m - 1
+    half = n_bits // 2
+    m = 2 ** half
+    levels = np.zeros(m)
+    levels[_gray(half)] = 2 * np.arange(m) - (m - 1)
+    return (levels[:, np.newaxis] + 1j * levels[np.newaxis, :]).ravel()
+
+
+# lookup tables of the constellations, the index is the group of bits read as a binary
+# number with the first bit as the most significant one; BPSK and QPSK map the bit '0'
+# to the level -1 and '1' to +1, the first bit of a QPSK pair goes to I
+CONSTELLATIONS = {"bpsk": np.array([-1, 1], dtype=complex),
+                  "qpsk": np.array([-1 - 1j, -1 + 1j, 1 - 1j, 1 + 1j]),
+                  "8psk": _psk_table(3),
+                  "16qam": _qam_table(4)}
+
+
+def bits_per_symbol(modulation):
+    """
+    Number of bits mapped into one symbol of the modulation, see *CONSTELLATIONS*
+    """
+    return int(np.log2(CONSTELLATIONS[modulation].size))
+
+
+def map_symbols(data, modulation):
+    """
+    Maps a binary sequence into complex symbols by a lookup table
+
+    :param data: binary sequence, zeros are appended to complete the last group of bits
+    :param modulation: bpsk, qpsk, 8psk or 16qam, see *CONSTELLATIONS*
+    :return: complex symbols, one per group of bits
+    """
+    table = CONSTELLATIONS[modulation]
+    k = bits_per_symbol(modulation)
+    data = np.ravel(data) > 0
+    n_sym = -(-data.size // k)
+    bits = np.zeros(n_sym * k, dtype=np.intp)
+    bits[:data.size] = data
+    idx = bits.reshape(-1, k) @ (1 << np.arange(k - 1, -1, -1))
+    return table[idx]
+
+
+def lut_map(t, data, s_rate, **args):
+    """
+    Generates a baseband signal of any modulation of *CONSTELLATIONS* and any pulse
+
+    The trains are envelopes of the pulses weighted by the levels of the symbols, see
+    *train_pulse*. The I and Q levels are scaled into the range 0 ... 1 of the train, shaped
+    by one pass of the train with the two components and scaled back. For BPSK and QPSK the
+    signal equals ``2 * train(bits) - 1`` of the I and Q bits.
+
+    :param t: time axis
+    :param data: binary sequence which is going to be mapped
+    :param s_rate: symbol rate of the transmitted baseband signal
+    :param args: optional arguments, see the table.
+
+    +------------+-------------+-----------+---------------------------------------------------+
+    | Key word   | Possible    | Default   | Description                                       |
+    |            | values      |           |                                                   |
+    +============+=============+===========+===================================================+
+    | modulation | bpsk, qpsk, |   bpsk    |  table of the constellation                       |
+    |            | 8psk, 16qam |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | pulse      | rect, sinc, |   rect    |  shape of the pulse                               |
+    |            | rcos        |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | tp         | positive    |           |  pulse width of a single symbol (rect) or the     |
+    |            | float       | 1/s_rate  |  spacing of the pulses (sinc, rcos)               |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | td         | positive    |           |  delay of the signal with reference to the origin |
+    |            | float       |   0       |  of the time axis                                 |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | ts         | positive    |   0       |  the space between pulses in a stream (rect)      |
+    |            | float       |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | pw         | positive    | 1/s_rate  |  pulse width of the sinc - main lobe (sinc, rcos) |
+    |            | float       |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | alpha      | positive    |   0.8     |  roll-off factor (rcos)                           |
+    |            | float       |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | span       | positive    |   none    |  length of the truncated pulse in symbols,        |
+    |            | float       |           |  see *train_pulse* (sinc, rcos)                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | first_     | int         |   0       |  index of the symbol of the first bits of *data*  |
+    | symbol     |             |           |  in a longer signal, its pulse is centered at (or |
+    |            |             |           |  starts at) td + first_symbol * tp, a part of a   |
+    |            |             |           |  signal mapped by its symbols equals the samples  |
+    |            |             |           |  of the whole signal                              |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | dtype      | complex128, | complex128|  type of the returned signal                      |
+    |            | complex64   |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | out        | complex     |   none    |  array of the shape of *t* the signal is written  |
+    |            | array       |           |  into, *dtype* is then the type of the array      |
+    +------------+-------------+-----------+---------------------------------------------------+
+
+    :return: Baseband signal, the array *out* when given
+    """
+    modulation = args.get('modulation', 'bpsk')
+    pulse = args.get('pulse', 'rect')
+    tp = args.get('tp', 1 / s_rate)
+    td = args.get('td', 0)
+    first = int(args.get('first_symbol', 0))
+
+    out = args.get('out')
+    if out is None:
+        out = np.empty(np.shape(t), dtype=args.get('dtype', complex))
+    elif np.shape(out) != np.shape(t) or not np.iscomplexobj(out):
+        raise ValueError("out has to be a complex array of the shape %s of the time axis"
+                         % (np.shape(t),))
+
+    table = CONSTELLATIONS[modulation]
+    symbols = map_symbols(data, modulation)
+
+    # levels of the I and Q components scaled into 0 ... 1, constant components are not shaped
+    lo = np.array([table.real.min(), table.imag.min()])
+    hi = np.array([table.real.max(), table.imag.max()])
+    shaped = np.flatnonzero(hi > lo)
+    levels = np.column_stack((symbols.real, symbols.imag))[:, shaped]
+    levels = (levels - lo[shaped]) / (hi - lo)[shaped]
+    if modulation in ("bpsk", "qpsk"):
+        levels = levels > 0.5  # the bits themselves, the trains keep their integer type
+
+    # Baseband signal generator
+    if pulse == 'rect':
+        ts = args.get('ts', 0)
+        x = gen.rect_tr(t, tp, ts, td, levels, first_pulse=first)
+    else:
+        # the pulses are continuous, the delay of the first symbol is taken as it is
+        td = td + first * tp
+        pw = args.get('pw', 1 / s_rate)
+        tr_args = {k: args[k] for k in ('span', 'stats') if k in args}
+        if pulse == 'sinc':
+            x = gen.sinc_tr(t, tp, td, levels, pw, **tr_args)
+        elif pulse == 'rcos':
+            x = gen.rcos_tr(t, tp, td, levels, pw, args.get('alpha', .8), **tr_args)
+        else:
+            raise ValueError("Unknown pulse '%s', use 'rect', 'sinc' or 'rcos'" % pulse)
+
+    # I and Q written into the real and imaginary parts of the output in place
+    column = {int(c): k for k, c in enumerate(shaped)}
+    for c, comp in enumerate((out.real, out.imag)):
+        if c in column:
+            np.multiply(x[..., column[c]], hi[c] - lo[c], out=comp, casting='unsafe')
+            comp += lo[c]
+        else:
+            comp[...] = lo[c]
+
+    return (out)
+
 def rect_bpsk_map(t, data, b_rate, **args):
     """
     Generates a baseband signal for a BPSK modulation with rectangular pulses
@@ -38,28 +215,7 @@ def rect_bpsk_map(t, data, b_rate, **args):
 
     :return: Baseband signal
     """
-    if 'tp' in args:
-        tp = args['tp']
-    else:
-        tp = 1 / b_rate  # pulse width of a single symbol
-
-    if 'td' in args:
-        td = args['td']
-    else:
-        td = 0  # signal starts at time td = 0s
-
-    if 'ts' in args:
-        ts = args['ts']
-    else:
-        ts = 0  # the space between pulses in a stream is ts = 0s
-
-    # Baseband signal generator
-    i_bb = 2 * gen.rect_tr(t, tp, ts, td, data) - 1
-    q_bb = np.zeros(np.size(t))
-    bb = i_bb + q_bb * 1j
-
-    return (bb)
-
+    return lut_map(t, data, b_rate, pulse='rect', modulation='bpsk', **args)
 
 def rect_qpsk_map(t, data, s_rate, **args):
     """
@@ -86,34 +242,7 @@ def rect_qpsk_map(t, data, s_rate, **args):
 
     :return: Baseband signal
     """
-    tup = 2  # number of bits in one tuple
-    n_d = tup - (np.size(data) % tup)
-    data = np.append(data, np.zeros(n_d))  # appends zero to get odd number of bits
-    data_2s = data.reshape(-1, tup)  # reshaping the data vector into matrix
-    data_2s = data_2s > 0
-
-    ## Baseband signal parameters
-    if 'tp' in args:
-        tp = args['tp']
-    else:
-        tp = 1 / s_rate  # pulse width of a single symbol
-
-    if 'td' in args:
-        td = args['td']
-    else:
-        td = 0  # signal starts at time td = 0s
-
-    if 'ts' in args:
-        ts = args['ts']
-    else:
-        ts = 0  # the space between pulses in a stream is ts = 0s
-
-    # Baseband signal generator
-    i_bb = 2 * gen.rect_tr(t, tp, ts, td, data_2s[:, 0]) - 1
-    q_bb = 2 * gen.rect_tr(t, tp, ts, td, data_2s[:, 1]) - 1
-    bb = i_bb + q_bb * 1j
-
-    return (bb)
+    return lut_map(t, data, s_rate, pulse='rect', modulation='qpsk', **args)
 
 # BPSK mapper 
 def sinc_bpsk_map(t, data, b_rate, **args):
@@ -138,30 +267,13 @@ def sinc_bpsk_map(t, data, b_rate, **args):
     | pw       | positive    | 1/b_rate  |  pulse width of the sinc - main lobe              |
     |          | float       |           |                                                   |
     +----------+-------------+-----------+---------------------------------------------------+
+    | span     | positive    |   none    |  length of the truncated pulse in symbols,        |
+    |          | float       |           |  see *train_pulse*                                |
+    +----------+-------------+-----------+---------------------------------------------------+
 
     :return: Baseband signal
     """
-    if 'tp' in args:
-        tp = args['tp']
-    else:
-        tp = 1 / b_rate  # pulse width of a single symbol
-
-    if 'td' in args:
-        td = args['td']
-    else:
-        td = 0  # signal starts at time td = 0s
-
-    if 'pw' in args:
-        pw = args['pw']
-    else:
-        pw = 1 / b_rate  # pulse width of the sinc - main lobe
-
-    # Baseband signal generator
-    i_bb = 2 * gen.sinc_tr(t, tp, td, data, pw) - 1
-    q_bb = np.zeros(np.size(t))
-    bb = i_bb + q_bb * 1j
-
-    return (bb)
+    return lut_map(t, data, b_rate, pulse='sinc', modulation='bpsk', **args)
 
 def sinc_qpsk_map(t, data, s_rate, **args):
     """
@@ -185,37 +297,13 @@ def sinc_qpsk_map(t, data, s_rate, **args):
     | pw       | positive    | 1/b_rate  |  pulse width of the sinc - main lobe              |
     |          | float       |           |                                                   |
     +----------+-------------+-----------+---------------------------------------------------+
+    | span     | positive    |   none    |  length of the truncated pulse in symbols,        |
+    |          | float       |           |  see *train_pulse*                                |
+    +----------+-------------+-----------+---------------------------------------------------+
 
     :return: Baseband signal
     """
-    tup = 2  # number of bits in one tuple
-    n_d = tup - (np.size(data) % tup)
-    data = np.append(data, np.zeros(n_d))  # appends zeros to get the proper shape
-    data_2s = data.reshape(-1, tup)  # reshaping the data vector into matrix
-    data_2s = data_2s > 0
-
-    ## Baseband signal parameters
-    if 'tp' in args:
-        tp = args['tp']
-    else:
-        tp = 1 / s_rate  # pulse width of a single symbol
-
-    if 'td' in args:
-        td = args['td']
-    else:
-        td = 0  # signal starts at time td = 0s
-
-    if 'pw' in args:
-        pw = args['pw']
-    else:
-        pw = 1 / s_rate  # pulse width of the sinc - main lobe
-
-    # Baseband signal generator
-    i_bb = 2 * gen.sinc_tr(t, tp, td, data_2s[:, 0], pw) - 1
-    q_bb = 2 * gen.sinc_tr(t, tp, td, data_2s[:, 1], pw) - 1
-    bb = i_bb + q_bb * 1j
-
-    return (bb)
+    return lut_map(t, data, s_rate, pulse='sinc', modulation='qpsk', **args)
 
 def rcos_bpsk_map(t, data, b_rate, **args):
     """
@@ -239,38 +327,16 @@ def rcos_bpsk_map(t, data, b_rate, **args):
     | pw       | positive    | 1/b_rate  |  pulse width of the sinc - main lobe              |
     |          | float       |           |                                                   |
     +----------+-------------+-----------+---------------------------------------------------+
+    | span     | positive    |   none    |  length of the truncated pulse in symbols,        |
+    |          | float       |           |  see *train_pulse*                                |
+    +----------+-------------+-----------+---------------------------------------------------+
     | alpha    | positive    |   0.8     |  roll-off factor                                  |
     |          | float       |           |                                                   |
     +----------+-------------+-----------+---------------------------------------------------+
 
     :return: Baseband signal
     """
-    if 'tp' in args:
-        tp = args['tp']
-    else:
-        tp = 1 / b_rate  # pulse width of a single symbol
-
-    if 'td' in args:
-        td = args['td']
-    else:
-        td = 0  # signal starts at time td = 0s
-
-    if 'pw' in args:
-        pw = args['pw']
-    else:
-        pw = 1 / b_rate  # pulse width of the sinc - main lobe
-
-    if 'alpha' in args:
-        alpha = args['alpha']
-    else:
-        alpha = .8  # roll-off factor
-
-    # Baseband signal generator
-    i_bb = 2 * gen.rcos_tr(t, tp, td, data, pw, alpha) - 1
-    q_bb = np.zeros(np.size(t))
-    bb = i_bb + q_bb * 1j
-
-    return (bb)
+    return lut_map(t, data, b_rate, pulse='rcos', modulation='bpsk', **args)
 
 def rcos_qpsk_map(t, data, s_rate, **args):
     """
@@ -294,42 +360,13 @@ def rcos_qpsk_map(t, data, s_rate, **args):
     | pw       | positive    | 1/b_rate  |  pulse width of the sinc - main lobe              |
     |          | float       |           |                                                   |
     +----------+-------------+-----------+---------------------------------------------------+
+    | span     | positive    |   none    |  length of the truncated pulse in symbols,        |
+    |          | float       |           |  see *train_pulse*                                |
+    +----------+-------------+-----------+---------------------------------------------------+
     | alpha    | positive    |   0.8     |  roll-off factor                                  |
     |          | float       |           |                                                   |
     +----------+-------------+-----------+---------------------------------------------------+
 
     :return: Baseband signal
     """
-    tup = 2  # number of bits in one tuple
-    n_d = tup - (np.size(data) % tup)
-    data = np.append(data, np.zeros(n_d))  # appends zeros to get the proper shape
-    data_2s = data.reshape(-1, tup)  # reshaping the data vector into matrix
-    data_2s = data_2s > 0
-
-    ## Baseband signal parameters
-    if 'tp' in args:
-        tp = args['tp']
-    else:
-        tp = 1 / s_rate  # pulse width of a single symbol
-
-    if 'td' in args:
-        td = args['td']
-    else:
-        td = 0  # signal starts at time td = 0s
-
-    if 'pw' in args:
-        pw = args['pw']
-    else:
-        pw = 1 / s_rate  # pulse width of the sinc - main lobe
-
-    if 'alpha' in args:
-        alpha = args['alpha']
-    else:
-        alpha = .8  # roll-off factor
-
-    # Baseband signal generator
-    i_bb = 2 * gen.rcos_tr(t, tp, td, data_2s[:, 0], pw, alpha) - 1
-    q_bb = 2 * gen.rcos_tr(t, tp, td, data_2s[:, 1], pw, alpha) - 1
-    bb = i_bb + q_bb * 1j
-
-    return (bb)
+    return lut_map(t, data, s_rate, pulse='rcos', modulation='qpsk', **args)
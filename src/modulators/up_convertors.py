@@ -1,7 +1,23 @@
+"""
+Up-convertors of complex baseband signals to the real passband signal.
 
+*quad_mod* modulates a whole signal given by its time axis at once. The numerically
+controlled oscillator *NCO* produces the carrier incrementally, block after block, with the
+phase continuous across the block boundaries, which suits streamed signals. The NCO evaluates
+the carrier by one of the methods
+
+* ``'direct'`` - np.cos and np.sin of the phase of every sample,
+* ``'rotation'`` (default) - a unit phasor precomputed for the samples of one block is rotated
+  to the phase of the block start, one complex product per sample,
+* ``'lut'`` - a lookup table of one period of the sine, linearly interpolated.
+
+The phase error of the Q branch is applied by a constant rotation of the I and Q
+components, the sampling jitter by a short series of the small phase deviations, so none of
+the methods evaluates transcendental functions on the whole signal.
+"""
 import numpy as np
 
-def quad_mod(bb, t, f0, p0, pE, jtr):
+def quad_mod(bb, t, f0, p0, pE, jtr, **args):
     """
     Quadrature modulator.
 
@@ -11,15 +27,16 @@ def quad_mod(bb, t, f0, p0, pE, jtr):
     :param p0: starting phase of the LO signal (phase disbalance)
     :param pE:  phase error between LO and LO+pi/2 signals
     :param jtr: sampling jitter (percent of sample period)
+    :param args: optional argument *rng*, the numpy random generator of the jitter
     :return: passband signal modulated
     """
 
-    # trange = np.max(t)-np.min(t);
-    # tstep = (trange/(np.size(t)-1));
-    # t_jitter = jtr*tstep/100 * randn(size(t));
-    # t_noisy = t + t_jitter;
-
     t_noisy = t
+    if jtr:
+        rng = args['rng'] if 'rng' in args else np.random.default_rng()
+        trange = np.max(t) - np.min(t)
+        tstep = trange / (np.size(t) - 1)
+        t_noisy = t + jtr * tstep / 100 * rng.standard_normal(np.shape(t))
 
     s_I = np.cos(2 * np.pi * f0 * t_noisy + p0);
     s_Q = np.sin(2 * np.pi * f0 * t_noisy + p0 + pE);
@@ -27,3 +44,130 @@ def quad_mod(bb, t, f0, p0, pE, jtr):
     x = np.real(bb) * s_I + np.imag(bb) * s_Q
 
     return (x)
+
+
+class NCO:
+    """
+    Numerically controlled oscillator of the quadrature modulator, see *quad_mod*
+
+    The phase is kept in cycles, so a long run does not lose the precision of the phase,
+    every call continues with the sample following the last generated one.
+
+    :param f0: carrier frequecy of real signal
+    :param f_sampl: sampling rate
+    :param p0: starting phase of the LO signal (phase disbalance)
+    :param pE: phase error between LO and LO+pi/2 signals
+    :param jtr: sampling jitter (percent of sample period)
+    :param args: optional arguments, see the table.
+
+    +------------+-------------+-----------+---------------------------------------------------+
+    | Key word   | Possible    | Default   | Description                                       |
+    |            | values      |           |                                                   |
+    +============+=============+===========+===================================================+
+    | method     | rotation,   | rotation  |  evaluation of the carrier, see the module        |
+    |            | lut, direct |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | lut_bits   | positive    |   12      |  the lookup table holds 2**lut_bits samples of    |
+    |            | int         |           |  one period                                       |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | block_size | positive    |   4096    |  number of samples of the precomputed phasor of   |
+    |            | int         |           |  the rotation method                              |
+    +------------+-------------+-----------+---------------------------------------------------+
+    | rng        | numpy       |   new     |  random generator of the jitter                   |
+    |            | Generator   |           |                                                   |
+    +------------+-------------+-----------+---------------------------------------------------+
+
+    **Example:**
+
+    >>> nco = NCO(f0=3e3, f_sampl=24e3)
+    >>> for bb in baseband_blocks:
+    ...     x = nco.modulate(bb)
+    """
+
+    def __init__(self, f0, f_sampl, p0=0.0, pE=0.0, jtr=0.0, **args):
+        self.f0 = f0
+        self.f_sampl = f_sampl
+        self.p0 = p0
+        self.pE = pE
+        self.jtr = jtr
+        self.method = args['method'] if 'method' in args else 'rotation'
+        if self.method not in ('rotation', 'lut', 'direct'):
+            raise ValueError("Unknown NCO method '%s', use 'rotation', 'lut' or 'direct'" % self.method)
+        self.rng = args['rng'] if 'rng' in args else np.random.default_rng()
+        self.step = f0 / f_sampl  # phase increment in cycles per sample
+        self.cycles = 0.0  # phase of the next sample in cycles, without p0, kept in [0, 1)
+
+        # constants of the phase error of the Q branch, sin(a + pE) = sin a cos pE + cos a sin pE
+        self._cos_pE = np.cos(pE)
+        self._sin_pE = np.sin(pE)
+        if self.method == 'rotation':
+            block_size = int(args['block_size']) if 'block_size' in args else 4096
+            self._phasor = np.exp(2j * np.pi * self.step * np.arange(block_size))
+        elif self.method == 'lut':
+            lut_bits = int(args['lut_bits']) if 'lut_bits' in args else 12
+            self._lut_size = 2 ** lut_bits
+            self._lut = np.sin(2 * np.pi * np.arange(self._lut_size + 1) / self._lut_size)
+
+    def reset(self, cycles=0.0):
+        """
+        Sets the phase of the next sample, in cycles
+        """
+        self.cycles = cycles % 1.0
+
+    def carrier(self, n):
+        """
+        Generates the next *n* samples of the LO signals
+
+        :param n: number of samples
+        :return: tuple (s_I, s_Q) of the cosine and the sine branch, see *quad_mod*
+        """
+        k = np.arange(n)
+        dev = None
+        if self.jtr:
+            # phase deviation of the jittered sampling instants in cycles
+            dev = self.step * self.jtr / 100 * self.rng.standard_normal(n)
+
+        if self.method == 'lut':
+            ph = self.cycles + self.p0 / (2 * np.pi) + k * self.step
+            if dev is not None:
+                ph += dev
+            s_I, s_sin = self._lut_sincos(ph)
+        else:
+            if self.method == 'direct':
+                z = np.exp(1j * (2 * np.pi * (self.cycles + k * self.step) + self.p0))
+            else:
+                z = np.empty(n, dtype=complex)
+                b = self._phasor.size
+                for k0 in range(0, n, b):
+                    start = np.exp(1j * (2 * np.pi * ((self.cycles + k0 * self.step) % 1.0) + self.p0))
+                    z[k0:k0 + b] = start * self._phasor[:min(b, n - k0)]
+            if dev is not None:
+                # rotation by the small angle, series up to the fourth order
+                a = 2 * np.pi * dev
+                a2 = a * a
+                z *= (1 - a2 / 2 + a2 * a2 / 24) + 1j * a * (1 - a2 / 6)
+            s_I, s_sin = z.real, z.imag
+
+        s_Q = s_sin * self._cos_pE + s_I * self._sin_pE
+        self.cycles = (self.cycles + n * self.step) % 1.0
+        return s_I, s_Q
+
+    def modulate(self, bb):
+        """
+        Up-converts the next block of the baseband signal
+
+        :param bb: baseband signal, complex
+        :return: passband signal modulated
+        """
+        s_I, s_Q = self.carrier(np.size(bb))
+        return np.real(bb) * s_I + np.imag(bb) * s_Q
+
+    def _lut_sincos(self, ph):
+        # linear interpolation in the table of one period, cos a = sin(a + 1/4 cycle)
+        out = []
+        for offset in (0.25, 0.0):
+            pos = ((ph + offset) % 1.0) * self._lut_size
+            i = np.minimum(pos.astype(np.intp), self._lut_size - 1)
+            w = pos - i
+            out.append(self._lut[i] + w * (self._lut[i + 1] - self._lut[i]))
+        return out[0], out[1]
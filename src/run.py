@@ -1,30 +1,61 @@
 #!/usr/bin/env python
+"""
+Runner of the SSRG code generation and analysis, a single run configured by the cnf files
+or a batch run (``-b sweep``, ``-b ber``).
+
+Plotting modules (matplotlib) and scipy.signal are imported only when they are used, a run
+with the plotting switched off and the batch runs never import them. Batch runs and runs
+started with ``--headless`` use the non-interactive Agg backend, they need no display and
+never show the plots, the plots are only saved. The time taken by the imports of the runner
+is logged and included in the summary of the run stages.
+"""
+import time
+_t_import = time.perf_counter()
 
 import sys
 sys.path.append("../src")
 
 import numpy as np
-import scipy.signal as signal
 import logging
 import logging.config
-import matplotlib.pyplot as plt
 
 from utils import freqaxis_shape as ut
 from utils import csv_interfaces as csvi
 from utils import setup as stp
-from utils import analytic_plots as aplt
+from utils import code_cache as cch
+from utils import instrumentation as ins
+from utils import waveform_io as wio
 from siggens import train_pulse as gen
 from siggens import PRN_bitstreams as prn
 from dsp import corrNumpy as ncorr
+import sweep
+import ber
+
+IMPORT_TIME = time.perf_counter() - _t_import
+
+
+def pyplot(headless=False):
+    """
+    Imports matplotlib.pyplot on the first use, the Agg backend is selected for headless runs
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
 
 # class NoLoggerConfiguration(Exception): pass
 
-def main(setup_data):
+def main(setup_data, headless=False):
 
     stp.logger_setup(setup_data["setup"])
     logger = logging.getLogger(__name__)
     logger.info("Main function started.")
+    inst = ins.Instrumentation(setup_data["timers"], setup_data["trace_memory"],
+                               setup_data["profile_file"])
+    inst.add_time("imports", IMPORT_TIME)
+    logger.info("Runner modules imported in %.3f s", IMPORT_TIME)
 
     logger.debug("Coder analysis configuration file %s", setup_data["cnf"])
     logger.debug("Setup configuration file %s", setup_data["setup"])
@@ -42,21 +73,55 @@ def main(setup_data):
     logger.debug("initial state of the ssrg, ssrg_init =  %s ", ssrg_init)
     ssrg_fb = analysis_setup["ssrg_fb"]
     logger.debug("feedback vector of the ssrg, ssrg_fb =  %s ", ssrg_fb)
-    srm = prn.build_srm(ssrg_fb)
-    logger.debug("srm matrix created, srm =  %s ", srm)
+    if logger.isEnabledFor(logging.DEBUG):
+        # the matrix is built only to be logged
+        srm = prn.build_srm(ssrg_fb)
+        logger.debug("srm matrix created, srm =  %s ", srm)
     logger.debug("Number of bits in one period of the code N = %s bits ", analysis_setup["code_period"])
     logger.debug("Number of periods being generated %s ", analysis_setup["n_o_periods"])
     n_of_bits = analysis_setup["code_period"] * analysis_setup["n_o_periods"]
     logger.debug("code generator setup - number of generated bits %s ", n_of_bits)
 
-    x = ssrg_init.T
-    code = np.zeros(1)
-    for i1 in range (1,n_of_bits):
-        x = prn.proceed_ssrg_onestep(x, srm)
-        csvi.write_csv(x, setup_data["data_state"], i1)
-        csvi.write_csv(x[-1], setup_data["data_code"], i1)
-        code = np.append(code,x[-1])
-    logger.debug("coder run - binary sequence generated, number of bits %s ", code.size)
+    cache = None
+    if setup_data["cache"]:
+        cache = cch.CodeCache(setup_data["cache_dir"], setup_data["cache_max_bytes"])
+        if setup_data["cache_clear"]:
+            cache.invalidate()
+            logger.debug("cache %s cleared", setup_data["cache_dir"])
+    code_params = {"ssrg_init": ssrg_init, "ssrg_fb": ssrg_fb, "n_of_bits": n_of_bits}
+
+    with inst.stage("coder"):
+        # the states are cached, the code is their last column; the outputs are written from the
+        # cached states too, a cache hit leaves the same files as a generated run
+        states_params = dict(code_params, entry="ssrg_states")
+        states = None
+        if cache:
+            states = cache.get_code(states_params)
+        if states is None:
+            # states after the steps 1 ... n_of_bits - 1 of proceed_ssrg_onestep with srm
+            states = prn.unpack_states(prn.ssrg_trajectory(ssrg_init, ssrg_fb, n_of_bits - 1),
+                                       analysis_setup["poly_degree"])
+            logger.debug("coder run - ssrg states generated, number of states %s ", len(states))
+            if cache:
+                cache.put_code(states_params, states)
+        else:
+            states = states.reshape(-1, analysis_setup["poly_degree"])
+            logger.debug("coder run skipped - ssrg states read from the cache, number of states %s ",
+                         len(states))
+        code = np.zeros(n_of_bits)
+        code[1:] = states[:, -1]
+        logger.debug("binary sequence of the coder, number of bits %s ", code.size)
+
+        fmt = setup_data["output_format"]
+        state_writer = csvi.BufferedWriter(csvi.output_filename(setup_data["data_state"], fmt), fmt,
+                                           setup_data["flush_rows"])
+        code_writer = csvi.BufferedWriter(csvi.output_filename(setup_data["data_code"], fmt), fmt,
+                                          setup_data["flush_rows"])
+        with state_writer, code_writer:
+            state_writer.write_rows(states, 1)
+            code_writer.write_rows(states[:, -1], 1)
+        logger.debug("ssrg state and code written, format %s", fmt)
+        inst.count("coder", "chips", code.size)
 
     #################### time related simulation ######################
     f_sampl = analysis_setup["chip_rate"] * analysis_setup["oversampling_factor"]
@@ -75,8 +140,10 @@ def main(setup_data):
     logger.debug("frequency axis for spectral analysis, length  %s", f.size)
     tc = ut.corr_fr_time(t)  # correlation time axis
     logger.debug("time axis correlation created, length  %s samples", tc.size)
-    tc_h = ut.corr_fr_halftime(t)  # correlation time axis
-    logger.debug("half time axis correlation created, length  %s samples", tc_h.size)
+    if logger.isEnabledFor(logging.DEBUG):
+        # the half time axis is only logged
+        tc_h = ut.corr_fr_halftime(t)  # correlation time axis
+        logger.debug("half time axis correlation created, length  %s samples", tc_h.size)
 
     tau = analysis_setup["time_accelerating_factor"]  # time acceleration factor
     logger.debug("time acceleration factor is %s", tau)
@@ -89,60 +156,108 @@ def main(setup_data):
     # a1 = gen.rcos_tr(t, Tstr, td + Tstr / 2, x, Ts, 1.0)
     # a2 = gen.rcos_tr(t, Tstr, td + Tstr / 2, x, Ts, 0.5)
     # a3 = gen.rcos_tr(t, Tstr, td + Tstr / 2, x, Ts, 0.0)
-    c = gen.rect_tr(t, Tstr, 0, td, code)
-    logger.debug("Oversampled signal with rectangular pulse shape created, number of samples %s", c.size)
-
-    # Correlate processor
-    c_con = np.concatenate((c,c))
-    A1_c = ncorr.corr_fd(c, c, )
-    # A1_c = signal.correlate(c, c_con, 'full', 'fft')
-    # A1_c = signal.convolve(c, c, 'full')
-    # A1_c = signal.fftconvolve(c, c, 'full')
-    # A1_c = np.real(np.fft.ifft( np.fft.fft(c)*np.fft.fft(c) ))
-    logger.debug("Autocorrelation function calculated, number of samples %s", A1_c.size)
+    with inst.stage("pulse shaping"):
+        waveform_params = dict(code_params, pulse_shape="rect", tp=Tstr, ts=0, td=td,
+                               f_sampl=f_sampl, t_int=T_int)
+        c = None
+        if cache:
+            c = cache.get_waveform(waveform_params)
+        if c is None:
+            c = gen.rect_tr(t, Tstr, 0, td, code)
+            logger.debug("Oversampled signal with rectangular pulse shape created, number of samples %s", c.size)
+            if cache:
+                cache.put_waveform(waveform_params, c)
+        else:
+            logger.debug("Oversampled signal read from the cache, number of samples %s", c.size)
+        inst.count("pulse shaping", "samples", c.size)
+        if setup_data["waveform_format"]:
+            wio.write_waveform(setup_data["data_waveform"], [c], c.size,
+                               dtype=setup_data["waveform_format"], levels=(0, 1))
+
+    with inst.stage("correlation"):
+        # Correlate processor
+        c_con = np.concatenate((c,c))
+        A1_c = ncorr.corr_fd(c, c, )
+        # A1_c = signal.correlate(c, c_con, 'full', 'fft')
+        # A1_c = signal.convolve(c, c, 'full')
+        # A1_c = signal.fftconvolve(c, c, 'full')
+        # A1_c = np.real(np.fft.ifft( np.fft.fft(c)*np.fft.fft(c) ))
+        logger.debug("Autocorrelation function calculated, number of samples %s", A1_c.size)
+        inst.count("correlation", "samples", c.size)
 
     ##################### Plots ###########################
-    plotting_setup = stp.plotting_cnf_file_parser(setup_data["plt"])
-    logger.debug("%s file read to setup plotting results", setup_data["plt"])
-
-    if plotting_setup["plotting"]:
-        #  Time domain
-        f1 = plt.figure(1, figsize=(10, 7), dpi=300)
-        f1ax1 = f1.add_subplot(211)
-        texts = {"y_legend": "$h_{rect}(t), \\beta = 1.0$",
-                 "title": "Pulse-shaped time-domain baseband signal",
-                 "y_label": "$prn(t)$",
-                 "x_label": "time [ms]"}
-        # figure_axes = [-0.25, 0.25, -100, 253000]
-        aplt.timedomain_plot(f1ax1,t,c,texts=texts)
-
-        #  Autocorrelated
-        # f2 = plt.figure(2, figsize=(10, 7), dpi=300)
-        # f2ax1 = f2.add_subplot(212)
-        f1ax2 = f1.add_subplot(212)
-        texts = {
-                 # "y_legend": "$h_{rect}(t), \\beta = 1.0$",
-                 # "title":"Pulse-shaped Autocorrelated",
-                 "y_label":"$C_{xx}(\\tau)$",
-                 "x_label":"time [ms]"}
-        # figure_axes = [-0.25, 0.25, -100, 253000]
-        tc_con = np.concatenate((tc,t))
-        aplt.timedomain_plot(f1ax2, f, A1_c, texts=texts)
-
-        if plotting_setup["show_plots"]:
-            # f1.show()
-            # f2.show()
-            plt.show()
-
-        if plotting_setup["save_plots"]:
-            ssrg_time = setup_data["data_path"] + 'ssrgout_timedomain.' + plotting_setup["plot_saving_format"]
-            ssrg_corr = setup_data["data_path"] + 'ssrgout_autocorr.' + plotting_setup["plot_saving_format"]
-            f1.savefig(ssrg_time, format=plotting_setup["plot_saving_format"])
-            # f2.savefig(ssrg_corr, format=plotting_setup["plot_saving_format"])
+    with inst.stage("plotting"):
+        plotting_setup = stp.plotting_cnf_file_parser(setup_data["plt"])
+        logger.debug("%s file read to setup plotting results", setup_data["plt"])
+
+        if plotting_setup["plotting"]:
+            plt = pyplot(headless)
+            from utils import analytic_plots as aplt
+            # shown figures can be zoomed, all the samples are drawn
+            decimate = headless or not plotting_setup["show_plots"]
+            #  Time domain
+            f1 = plt.figure(1, figsize=(10, 7), dpi=300)
+            f1ax1 = f1.add_subplot(211)
+            texts = {"y_legend": "$h_{rect}(t), \\beta = 1.0$",
+                     "title": "Pulse-shaped time-domain baseband signal",
+                     "y_label": "$prn(t)$",
+                     "x_label": "time [ms]"}
+            # figure_axes = [-0.25, 0.25, -100, 253000]
+            aplt.timedomain_plot(f1ax1,t,c,texts=texts, decimate=decimate)
+
+            #  Autocorrelated
+            # f2 = plt.figure(2, figsize=(10, 7), dpi=300)
+            # f2ax1 = f2.add_subplot(212)
+            f1ax2 = f1.add_subplot(212)
+            texts = {
+                     # "y_legend": "$h_{rect}(t), \\beta = 1.0$",
+                     # "title":"Pulse-shaped Autocorrelated",
+                     "y_label":"$C_{xx}(\\tau)$",
+                     "x_label":"time [ms]"}
+            # figure_axes = [-0.25, 0.25, -100, 253000]
+            tc_con = np.concatenate((tc,t))
+            aplt.timedomain_plot(f1ax2, f, A1_c, texts=texts, decimate=decimate)
+
+            if plotting_setup["show_plots"] and headless:
+                logger.info("Headless run, plots are not shown")
+            elif plotting_setup["show_plots"]:
+                # f1.show()
+                # f2.show()
+                plt.show()
+
+            if plotting_setup["save_plots"]:
+                ssrg_time = setup_data["data_path"] + 'ssrgout_timedomain.' + plotting_setup["plot_saving_format"]
+                ssrg_corr = setup_data["data_path"] + 'ssrgout_autocorr.' + plotting_setup["plot_saving_format"]
+                f1.savefig(ssrg_time, format=plotting_setup["plot_saving_format"])
+                # f2.savefig(ssrg_corr, format=plotting_setup["plot_saving_format"])
+
+    inst.report(logger)
+
+
+def main_batch(setup_data, batch="sweep"):
+
+    stp.logger_setup(setup_data["setup"])
+    logger = logging.getLogger(__name__)
+    logger.info("Batch mode %s started.", batch)
+    inst = ins.Instrumentation(setup_data["timers"], setup_data["trace_memory"],
+                               setup_data["profile_file"])
+    inst.add_time("imports", IMPORT_TIME)
+    logger.info("Runner modules imported in %.3f s", IMPORT_TIME)
+    analysis_setup = stp.analysis_cnf_file_parser(setup_data["cnf"])
+    logger.debug("%s file read to setup the batch run", setup_data["cnf"])
+    with inst.stage(batch):
+        if batch == "ber":
+            ber.main(setup_data, analysis_setup)
+        else:
+            sweep.main(setup_data, analysis_setup)
+    inst.report(logger)
 
 
 if __name__ == '__main__':
-    setup_file = stp.parse_CMDLine()
+    setup_file, batch, headless = stp.parse_CMDLine()
     print (setup_file)
     setup_data = stp.setup_cnf_file_parser(setup_file)
-    main(setup_data)
+    if batch:
+        main_batch(setup_data, batch)
+    else:
+        main(setup_data, headless)
@@ -4,10 +4,31 @@ or deterministic. Algorithms are developed based on the book *Spread Spectrum Sy
 GNSS and Wireless Communications* by Jack K. Holmes.
 
 Returned binary sequences are numpy arrays of the type *bool*.
+
+Two generator backends are available for *ssrg* and *gold_seq*. The ``'loop'`` backend
+advances the shift register one chip per iteration and is kept as a reference. The
+``'packed'`` backend (default) keeps the register state as a packed integer and produces
+the output chips by leapfrog stepping of the linear recurrence, so that a whole block of
+chips is obtained by a single XOR of shifted copies of the already generated sequence.
+Both backends return identical sequences.
 """
+import time
+from collections import OrderedDict
 import numpy as np
 import logging
 
+# GPS C/A code generators G1 and G2, both start from the all-ones state
+GPS_G1_FB = np.array([0, 0, 1, 0, 0, 0, 0, 0, 0, 1])
+GPS_G2_FB = np.array([0, 1, 1, 0, 0, 1, 0, 1, 1, 1])
+GPS_G_INIT = np.array([1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
+# G2 phase selecting taps (x1, x2) of the GPS C/A codes indexed by the PRN number
+GPS_CA_TAPS = {1: (2, 6), 2: (3, 7), 3: (4, 8), 4: (5, 9), 5: (1, 9), 6: (2, 10), 7: (1, 8),
+               8: (2, 9), 9: (3, 10), 10: (2, 3), 11: (3, 4), 12: (5, 6), 13: (6, 7),
+               14: (7, 8), 15: (8, 9), 16: (9, 10), 17: (1, 4), 18: (2, 5), 19: (3, 6),
+               20: (4, 7), 21: (5, 8), 22: (6, 9), 23: (1, 3), 24: (4, 6), 25: (5, 7),
+               26: (6, 8), 27: (7, 9), 28: (8, 10), 29: (1, 6), 30: (2, 7), 31: (3, 8),
+               32: (4, 9), 33: (5, 10), 34: (4, 10), 35: (1, 7), 36: (2, 8), 37: (4, 10)}
+
 def build_srm(fb_vector):
     logger = logging.getLogger(__name__)
     logger.debug("build_srm function started.")
@@ -28,16 +49,281 @@ def build_srm(fb_vector):
 #     else:
 #         return int(srm * proceed_ssrg_recursion(n-1,x,srm) %2)
 
+def pack_srm(srm):
+    """
+    Packs the state-transition matrix into a tuple of integer rows
+
+    :param srm: state-transition matrix, see *build_srm*
+    :return: tuple of integers, bit *j* of the row *i* holds the element srm[i, j]
+    """
+    return tuple(pack_state(row) for row in np.asarray(srm))
+
+
+def gf2_matmul(a, b):
+    """
+    Product of two packed bit matrices over GF(2)
+
+    :param a: packed matrix, see *pack_srm*
+    :param b: packed matrix, see *pack_srm*
+    :return: packed matrix a * b
+    """
+    out = []
+    for row in a:
+        acc = 0
+        j = 0
+        while row:
+            if row & 1:
+                acc ^= b[j]
+            row >>= 1
+            j += 1
+        out.append(acc)
+    return tuple(out)
+
+
+def gf2_matpow(a, n):
+    """
+    Raises a packed bit matrix to the power of *n* over GF(2) by square-and-multiply,
+    the cost is O(log n) matrix products
+
+    :param a: packed square matrix, see *pack_srm*
+    :param n: non-negative integer exponent
+    :return: packed matrix a ** n
+    """
+    result = tuple(1 << i for i in range(len(a)))
+    base = a
+    n = int(n)
+    while n > 0:
+        if n & 1:
+            result = gf2_matmul(result, base)
+        n >>= 1
+        if n:
+            base = gf2_matmul(base, base)
+    return result
+
+
+def gf2_matvec(a, x_word):
+    """
+    Product of a packed bit matrix and a packed column vector over GF(2)
+
+    :param a: packed matrix, see *pack_srm*
+    :param x_word: packed vector, see *pack_state*
+    :return: packed vector a * x
+    """
+    y = 0
+    for i, row in enumerate(a):
+        if bin(row & x_word).count('1') & 1:
+            y |= 1 << i
+    return y
+
+
+def proceed_ssrg_jump(n, x, srm):
+    """
+    Jumps the SSRG *n* steps ahead, exact for any *n*
+
+    :param n: number of steps
+    :param x: state of the register, column vector
+    :param srm: state-transition matrix, see *build_srm*
+    :return: state of the register after *n* steps, column vector of the type *np.matrix*
+    """
+    srm_n = gf2_matpow(pack_srm(srm), n)
+    y = gf2_matvec(srm_n, pack_state(x))
+    return np.matrix(unpack_state(y, np.size(x))).T
+
+
+def ssrg_seek(init_reg, fb_reg, offset):
+    """
+    State of the simple shift register generator after *offset* chips, generating
+    from the returned state continues the sequence at the chip *offset*
+
+    :param init_reg: initial state of the shift register
+    :param fb_reg: feedback vector, bit '1' means -> FB is connected
+    :param offset: number of chips to be skipped
+    :return: numpy array, state of the register
+    """
+    srm = build_srm(np.matrix(np.asarray(fb_reg).ravel()))
+    x = proceed_ssrg_jump(offset, init_reg, srm)
+    return np.asarray(x).ravel()
+
+
 def proceed_ssrg_np_pow(n,x,srm):
-    a = ((srm**n) * x)%2
-    return a.astype(int)
+    # srm**n of a float matrix loses exactness for large n, jump over GF(2) instead
+    return proceed_ssrg_jump(n, x, srm)
 
 def proceed_ssrg_onestep(x,srm):
     out = (srm * x)%2
     return out.astype(int)
 
 
+def pack_state(reg):
+    """
+    Packs a shift register into an integer word
+
+    :param reg: shift register or feedback vector, sequence of 0/1, index 0 is the input stage
+    :return: integer, bit *j* of the word holds the stage *j* of the register
+    """
+    word = 0
+    for j, b in enumerate(np.asarray(reg).ravel()):
+        if int(b) % 2:
+            word |= 1 << j
+    return word
+
+
+def unpack_state(word, nob):
+    """
+    Unpacks an integer word into a shift register, inverse to *pack_state*
+
+    :param word: packed state of the register
+    :param nob: number of stages of the register
+    :return: numpy array of 0/1 integers, index 0 is the input stage
+    """
+    return np.array([(word >> j) & 1 for j in range(nob)], dtype=int)
+
+
+def check_register(init_reg, fb_reg, max_stages=None):
+    """
+    Checks that the feedback vector fits the shift register before they are packed
+
+    :param init_reg: initial state of the shift register
+    :param fb_reg: feedback vector
+    :param max_stages: the largest number of stages, e.g. 64 of the uint64 packed states
+    :return: number of stages of the register
+    """
+    nob = np.size(init_reg)
+    if np.size(fb_reg) != nob:
+        raise ValueError("feedback vector of %s taps does not fit the register of %s stages"
+                         % (np.size(fb_reg), nob))
+    if max_stages is not None and nob > max_stages:
+        raise ValueError("register of %s stages, at most %s stages are supported"
+                         % (nob, max_stages))
+    return nob
+
+
+def lfsr_chips(state_word, fb_word, nob, n_chips):
+    """
+    Packed-word engine of the simple shift register generator
+
+    The chip sequence *c* read from the last stage satisfies the recurrence
+    c[i] = XOR of c[i - j - 1] over all taps *j* of the feedback. Squaring the feedback
+    polynomial *k*-times scales all the lags by 2**k, so once enough chips are known
+    the next ``min_lag * 2**k`` chips are computed at once from shifted slices of the
+    sequence. The block length grows with the generated sequence and the whole run
+    costs O(n_chips * number of taps) element operations.
+
+    :param state_word: packed state of the register, see *pack_state*
+    :param fb_word: packed feedback vector, see *pack_state*
+    :param nob: number of stages of the register
+    :param n_chips: number of chips to be generated
+    :return: tuple (chips, state_word), chips is a numpy array of the type *bool*,
+             state_word is the packed state of the register after *n_chips* steps
+    """
+    if fb_word >> nob:
+        raise ValueError("feedback word %s has taps past the %s stages of the register"
+                         % (bin(fb_word), nob))
+    lags = [j + 1 for j in range(nob) if (fb_word >> j) & 1]
+    n_total = n_chips + nob
+    seq = np.zeros(n_total, dtype=np.uint8)
+    # the first nob chips are the stages of the initial register, last stage first
+    for k in range(nob):
+        seq[k] = (state_word >> (nob - 1 - k)) & 1
+
+    if lags:
+        max_lag = max(lags)
+        min_lag = min(lags)
+        filled = nob
+        k = 0
+        while filled < n_total:
+            # the recurrence with lags scaled by 2**k holds from nob + (2**k - 1) * max_lag on
+            while nob + ((1 << (k + 1)) - 1) * max_lag <= filled:
+                k += 1
+            stop = min(filled + (min_lag << k), n_total)
+            blk = seq[filled - (lags[0] << k):stop - (lags[0] << k)].copy()
+            for lag in lags[1:]:
+                blk ^= seq[filled - (lag << k):stop - (lag << k)]
+            seq[filled:stop] = blk
+            filled = stop
+
+    # register after n_chips steps holds the chips n_chips ... n_chips + nob - 1 reversed
+    state_out = 0
+    for j in range(nob):
+        if seq[n_chips + nob - 1 - j]:
+            state_out |= 1 << j
+    return seq[:n_chips].view(bool), state_out
+
+
+def ssrg_trajectory(init_reg, fb_reg, n_steps):
+    """
+    States of the simple shift register generator after each of *n_steps* steps, computed in
+    one pass by the packed-word engine, see *lfsr_chips*. The step is the one of
+    *proceed_ssrg_onestep* with the matrix *build_srm(fb_reg)*.
+
+    :param init_reg: initial state of the shift register
+    :param fb_reg: feedback vector, bit '1' means -> FB is connected
+    :param n_steps: number of steps
+    :return: numpy array of the type uint64 of packed states after the steps 1 ... n_steps,
+             see *pack_state* and *unpack_states*, ValueError is raised for a feedback vector
+             of another length than the register and for registers longer than 64 stages
+    """
+    nob = check_register(init_reg, fb_reg, 64)
+    chips, _ = lfsr_chips(pack_state(init_reg), pack_state(fb_reg), nob, n_steps + nob)
+    chips = chips.view(np.uint8)
+    # the state after the step i holds the chips i ... i + nob - 1, the last stage first
+    words = np.zeros(n_steps, dtype=np.uint64)
+    for j in range(nob):
+        words |= chips[1 + nob - 1 - j:1 + nob - 1 - j + n_steps].astype(np.uint64) << np.uint64(j)
+    return words
+
+
+def unpack_states(words, nob):
+    """
+    Unpacks an array of packed states into a matrix, inverse to *pack_state* applied row-wise
+
+    :param words: packed states
+    :param nob: number of stages of the register
+    :return: numpy array of the type uint8 of the shape (states, nob)
+    """
+    words = np.asarray(words, dtype=np.uint64)
+    shifts = np.arange(nob, dtype=np.uint64)
+    return ((words[:, np.newaxis] >> shifts) & np.uint64(1)).astype(np.uint8)
+
+
+def _report_throughput(name, n_chips, t_start, args):
+    logger = logging.getLogger(__name__)
+    elapsed = time.perf_counter() - t_start
+    chips_per_s = n_chips / elapsed if elapsed > 0 else float('inf')
+    logger.debug("%s generated %s chips in %.6f s, throughput %.3e chips/s", name, n_chips, elapsed, chips_per_s)
+    if 'stats' in args:
+        args['stats'].update({"chips": n_chips, "seconds": elapsed, "chips_per_s": chips_per_s})
+    return chips_per_s
+
+
+def _select_backend(args, verbosity):
+    if 'backend' in args:
+        backend = args['backend']
+    else:
+        backend = 'packed'
+    if backend not in ('packed', 'loop'):
+        raise ValueError("Unknown generator backend '%s', use 'packed' or 'loop'" % backend)
+    if verbosity:
+        # step by step printouts are available for the reference loop only
+        backend = 'loop'
+    return backend
+
+
 def ssrg(init_reg, fb_reg, **args):
+    """
+    Simple shift register generator
+
+    :param init_reg: initial state of the shift register
+    :param fb_reg: feedback vector, bit '1' means -> FB is connected
+    :param args: optional arguments *n_bits* (default 7), *verbosity* (default False),
+                 *offset* (default 0), *backend* (``'packed'`` default or ``'loop'``) and
+                 *stats*, a dictionary which is filled with the number of chips, run time
+                 and throughput in chips/s
+    :return: binary sequence, the last of *n_bits* is always False
+
+    With *offset* = k the generator jumps to the chip k without stepping through the first
+    k chips, ``ssrg(init, fb, n_bits=n, offset=k)`` equals ``ssrg(init, fb, n_bits=n+k)[k:]``.
+    """
     if 'n_bits' in args:
         n_bits = int(args['n_bits'])
     else:
@@ -48,6 +334,21 @@ def ssrg(init_reg, fb_reg, **args):
     else:
         verbosity = False
 
+    if 'offset' in args and int(args['offset']) > 0:
+        init_reg = ssrg_seek(init_reg, fb_reg, int(args['offset']))
+
+    backend = _select_backend(args, verbosity)
+    nob = check_register(init_reg, fb_reg)
+    t_start = time.perf_counter()
+
+    if backend == 'packed':
+        x = np.zeros(n_bits, dtype=bool)
+        if n_bits > 1:
+            chips, _ = lfsr_chips(pack_state(init_reg), pack_state(fb_reg), nob, n_bits - 1)
+            x[:n_bits - 1] = chips
+        _report_throughput("ssrg", n_bits, t_start, args)
+        return x
+
     #  Output register
     x=np.zeros([n_bits])
     #  Shift register
@@ -62,9 +363,20 @@ def ssrg(init_reg, fb_reg, **args):
         shft_reg[0] = in1
         if verbosity:
             print('For i=',i1,'shift register:',shft_reg,'output:',x)
+    _report_throughput("ssrg", n_bits, t_start, args)
     return (x.astype(bool))
 
 def gold_seq(x1, x2, **args):
+    """
+    Gold code generator of the GPS C/A type, two 10 stage m-sequence generators G1 and G2
+
+    :param x1: first phase selecting tap of the G2 register, 1 ... 10
+    :param x2: second phase selecting tap of the G2 register, 1 ... 10
+    :param args: optional arguments *no_bits* (default 1023), *no_periods* (default 1),
+                 *verbosity* (default False), *offset* (default 0), *backend* (``'packed'``
+                 default or ``'loop'``) and *stats*, see *ssrg*
+    :return: binary sequence
+    """
     if 'verbosity' in args:
         verbosity = bool(args['verbosity'])
     else:
@@ -84,11 +396,30 @@ def gold_seq(x1, x2, **args):
     x = np.zeros([no_periods * no_bits])
     # Maximum-length sequence generators:
     #  Shift registers
-    shft_reg_1 = np.array([1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
-    shft_reg_2 = np.array([1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
+    shft_reg_1 = GPS_G_INIT.copy()
+    shft_reg_2 = GPS_G_INIT.copy()
     #  Feedback registers - bit '1' means -> FB is connected
-    fbck_reg_1 = np.array([0, 0, 1, 0, 0, 0, 0, 0, 0, 1])
-    fbck_reg_2 = np.array([0, 1, 1, 0, 0, 1, 0, 1, 1, 1])
+    fbck_reg_1 = GPS_G1_FB.copy()
+    fbck_reg_2 = GPS_G2_FB.copy()
+
+    if 'offset' in args and int(args['offset']) > 0:
+        # both generators jump to the chip offset
+        shft_reg_1 = ssrg_seek(shft_reg_1, fbck_reg_1, int(args['offset']))
+        shft_reg_2 = ssrg_seek(shft_reg_2, fbck_reg_2, int(args['offset']))
+
+    backend = _select_backend(args, verbosity)
+    t_start = time.perf_counter()
+
+    if backend == 'packed':
+        n = no_periods * no_bits
+        # G2 stage j at the step i is the chip i + 9 - j of the G2 output
+        j1 = range(10)[x1 - 1]
+        j2 = range(10)[x2 - 1]
+        g1, _ = lfsr_chips(pack_state(shft_reg_1), pack_state(fbck_reg_1), 10, n)
+        g2, _ = lfsr_chips(pack_state(shft_reg_2), pack_state(fbck_reg_2), 10, n + 9)
+        x = g1 ^ g2[9 - j1:9 - j1 + n] ^ g2[9 - j2:9 - j2 + n]
+        _report_throughput("gold_seq", n, t_start, args)
+        return x
 
     if verbosity == 1:
         print('G1: ', shft_reg_1, 'G2: ', shft_reg_2)
@@ -115,4 +446,123 @@ def gold_seq(x1, x2, **args):
             print('G1:', shft_reg_1, 'G2:', shft_reg_2, 'g2a:', shft_reg_2[x1], 'g2b:', shft_reg_2[x2], 'g2out:', g2,
                   'g1out:', g1, 'out:', x[i1])
 
+    _report_throughput("gold_seq", no_periods * no_bits, t_start, args)
     return (x.astype(bool))
+
+
+def ssrg_blocks(init_reg, fb_reg, block_size, **args):
+    """
+    Endless stream of the simple shift register generator output split into blocks,
+    the state of the register is carried from one block to the next one
+
+    :param init_reg: initial state of the shift register
+    :param fb_reg: feedback vector, bit '1' means -> FB is connected
+    :param block_size: number of chips in one block
+    :param args: optional argument *offset*, the chip the stream starts with (default 0)
+    :return: generator of binary sequences of the length *block_size*
+    """
+    if 'offset' in args and int(args['offset']) > 0:
+        init_reg = ssrg_seek(init_reg, fb_reg, int(args['offset']))
+    nob = check_register(init_reg, fb_reg)
+    state = pack_state(init_reg)
+    fb_word = pack_state(fb_reg)
+    while True:
+        chips, state = lfsr_chips(state, fb_word, nob, block_size)
+        yield chips
+
+
+def gold_blocks(x1, x2, block_size, **args):
+    """
+    Endless stream of the Gold code generator output split into blocks, see *gold_seq*
+
+    :param x1: first phase selecting tap of the G2 register, 1 ... 10
+    :param x2: second phase selecting tap of the G2 register, 1 ... 10
+    :param block_size: number of chips in one block
+    :param args: optional argument *offset*, the chip the stream starts with (default 0)
+    :return: generator of binary sequences of the length *block_size*
+    """
+    j1 = range(10)[x1 - 1]
+    j2 = range(10)[x2 - 1]
+    reg_1 = GPS_G_INIT
+    reg_2 = GPS_G_INIT
+    if 'offset' in args and int(args['offset']) > 0:
+        reg_1 = ssrg_seek(reg_1, GPS_G1_FB, int(args['offset']))
+        reg_2 = ssrg_seek(reg_2, GPS_G2_FB, int(args['offset']))
+    state_1 = pack_state(reg_1)
+    state_2 = pack_state(reg_2)
+    fb_1 = pack_state(GPS_G1_FB)
+    fb_2 = pack_state(GPS_G2_FB)
+    while True:
+        g1, state_1 = lfsr_chips(state_1, fb_1, 10, block_size)
+        g2, state_2 = lfsr_chips(state_2, fb_2, 10, block_size)
+        # the next 9 chips of G2 are the stages of its register, last stage first
+        g2 = np.concatenate((g2, unpack_state(state_2, 10)[:0:-1].astype(bool)))
+        yield g1 ^ g2[9 - j1:9 - j1 + block_size] ^ g2[9 - j2:9 - j2 + block_size]
+
+
+class GoldCodeBank:
+    """
+    Bank of Gold codes of the GPS C/A type. The m-sequences G1 and G2 are generated once,
+    every code is derived by XOR of G1 with two shifted copies of G2 and kept in memory,
+    the least recently used codes are dropped when more than *cache_size* codes are held.
+
+    :param no_bits: number of bits in one period (default 1023)
+    :param no_periods: number of periods (default 1)
+    :param cache_size: number of codes kept in memory (default 64)
+
+    **Example:**
+
+    >>> bank = GoldCodeBank()
+    >>> prn_1 = bank[1]                    # PRN 1, taps (2, 6)
+    >>> prn_x = bank.by_taps(3, 7)         # equals gold_seq(3, 7)
+    >>> all_ca = bank.codes(range(1, 33))  # array of the shape (32, 1023)
+    """
+
+    def __init__(self, no_bits=1023, no_periods=1, cache_size=64):
+        logger = logging.getLogger(__name__)
+        self.n_chips = int(no_bits) * int(no_periods)
+        self.cache_size = int(cache_size)
+        self.g1, _ = lfsr_chips(pack_state(GPS_G_INIT), pack_state(GPS_G1_FB), 10, self.n_chips)
+        # G2 stage j at the step i is the chip i + 9 - j of the G2 output
+        self.g2, _ = lfsr_chips(pack_state(GPS_G_INIT), pack_state(GPS_G2_FB), 10, self.n_chips + 9)
+        self._codes = OrderedDict()
+        logger.debug("Gold code bank created, %s chips per code", self.n_chips)
+
+    def by_taps(self, x1, x2):
+        """
+        Gold code selected by the G2 phase taps, see *gold_seq*
+
+        :param x1: first phase selecting tap of the G2 register, 1 ... 10
+        :param x2: second phase selecting tap of the G2 register, 1 ... 10
+        :return: binary sequence, read-only
+        """
+        key = (range(10)[x1 - 1], range(10)[x2 - 1])
+        if key in self._codes:
+            self._codes.move_to_end(key)
+            return self._codes[key]
+        j1, j2 = key
+        n = self.n_chips
+        x = self.g1 ^ self.g2[9 - j1:9 - j1 + n] ^ self.g2[9 - j2:9 - j2 + n]
+        x.setflags(write=False)
+        self._codes[key] = x
+        while len(self._codes) > self.cache_size:
+            self._codes.popitem(last=False)
+        return x
+
+    def __getitem__(self, prn):
+        """
+        GPS C/A code of the PRN number *prn*, see *GPS_CA_TAPS*
+        """
+        return self.by_taps(*GPS_CA_TAPS[prn])
+
+    def codes(self, prns):
+        """
+        Codes of several PRN numbers stacked into an array of the shape (PRNs, chips)
+        """
+        return np.array([self[prn] for prn in prns], dtype=bool).reshape(-1, self.n_chips)
+
+    def clear(self):
+        """
+        Drops all the cached codes
+        """
+        self._codes.clear()
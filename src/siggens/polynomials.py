@@ -0,0 +1,236 @@
+"""
+Catalog of the irreducible and primitive polynomials over GF(2) listed in
+*data/polynomials.tab*, see *data/polynomials.readme* for the meaning of the table.
+
+The text table is parsed once into a structured numpy array with the columns
+
+* *degree* - degree of the section of the table,
+* *j* - the entry is the minimum polynomial of a**j, a is a root of the first polynomial
+  of the section,
+* *poly* - coefficients of the polynomial as an integer, bit *k* holds the coefficient
+  of X**k (the octal number of the table),
+* *letter* - letter following the octal number, empty for the polynomials of a smaller
+  degree than the one of the section; E, F, G, H mark primitive polynomials,
+* *exponent* - exponent to which the polynomial belongs, (2**m - 1) / gcd(2**m - 1, j).
+
+The parsed array is stored in a binary *.npz* file and read from it in the following runs,
+the text is parsed again only when the table is newer than the binary file. A few digits
+of the table are misread by OCR, 'I' or 'l' stand for '1' and a trailing '8' stands for the
+letter 'B'. Both are corrected by the parser.
+
+Polynomials are converted into the feedback vectors of *build_srm*, *ssrg* and
+*ssrg_trajectory* by *fb_taps*.
+"""
+import os
+import math
+import logging
+import functools
+import numpy as np
+
+# bump when the layout of the binary catalog changes
+CATALOG_VERSION = 1
+
+CATALOG_DTYPE = np.dtype([("degree", np.uint8),
+                          ("j", np.uint32),
+                          ("poly", np.uint64),
+                          ("letter", "S1"),
+                          ("exponent", np.uint64)])
+
+PRIMITIVE_LETTERS = "EFGH"
+IRREDUCIBLE_LETTERS = "ABCDEFGH"
+
+_OCR_DIGITS = str.maketrans("IlO", "110")
+
+
+def parse_table(tab_file):
+    """
+    Parses the text table of polynomials
+
+    :param tab_file: path to *polynomials.tab*
+    :return: structured array of the type CATALOG_DTYPE, ordered as in the table
+    """
+    rows = []
+    degree = None
+    with open(tab_file) as f:
+        for n_line, line in enumerate(f, 1):
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "DEGREE":
+                degree = int(tokens[1])
+                tokens = tokens[2:]
+            if degree is None or len(tokens) % 2:
+                raise ValueError("%s, line %s can not be parsed" % (tab_file, n_line))
+            for j_tok, p_tok in zip(tokens[::2], tokens[1::2]):
+                try:
+                    j = int(j_tok.translate(_OCR_DIGITS))
+                    poly, letter = _parse_entry(p_tok, degree)
+                except ValueError:
+                    raise ValueError("%s, line %s, entry '%s %s' can not be parsed"
+                                     % (tab_file, n_line, j_tok, p_tok))
+                period = 2 ** degree - 1
+                rows.append((degree, j, poly, letter, period // math.gcd(period, j)))
+    return np.array(rows, dtype=CATALOG_DTYPE)
+
+
+def _parse_entry(token, degree):
+    # the octal number has the width of a polynomial of the degree of the section
+    width = (degree + 3) // 3
+    token = token[:width].translate(_OCR_DIGITS) + token[width:]
+    digits, letter = token[:width], token[width:]
+    if letter == "8":
+        letter = "B"
+    if len(digits) != width or (letter and letter not in IRREDUCIBLE_LETTERS) or len(letter) > 1:
+        raise ValueError(token)
+    return int(digits, 8), letter
+
+
+@functools.lru_cache(maxsize=8)
+def load_catalog(tab_file, cache_dir=None):
+    """
+    Catalog of the polynomials of the table, read from the binary file when it is up to date
+
+    :param tab_file: path to *polynomials.tab*
+    :param cache_dir: folder of the binary file, the folder of the table when None
+    :return: PolynomialCatalog, shared by the calls with the same arguments
+    """
+    logger = logging.getLogger(__name__)
+    folder = os.path.dirname(tab_file) if cache_dir is None else cache_dir
+    name = os.path.splitext(os.path.basename(tab_file))[0] + ".npz"
+    bin_file = os.path.join(folder, name)
+    if os.path.exists(bin_file) and os.path.getmtime(bin_file) >= os.path.getmtime(tab_file):
+        with np.load(bin_file) as f:
+            if int(f["version"]) == CATALOG_VERSION:
+                logger.debug("polynomial catalog read from %s", bin_file)
+                return PolynomialCatalog(f["entries"])
+    entries = parse_table(tab_file)
+    logger.debug("polynomial catalog parsed from %s, %s entries", tab_file, entries.size)
+    try:
+        os.makedirs(folder or ".", exist_ok=True)
+        tmp = bin_file + ".tmp.npz"
+        np.savez(tmp, entries=entries, version=CATALOG_VERSION)
+        os.replace(tmp, bin_file)
+    except OSError as e:
+        logger.warning("polynomial catalog not stored to %s, %s", bin_file, e)
+    return PolynomialCatalog(entries)
+
+
+class PolynomialCatalog:
+    """
+    Indexed catalog of polynomials, see *load_catalog*
+
+    :param entries: structured array of the type CATALOG_DTYPE
+
+    **Example:**
+
+    >>> cat = load_catalog("../data/polynomials.tab")
+    >>> p = cat.find(degree=5, primitive=True)     # 45E, 75G, 67H
+    >>> fb = fb_taps(p["poly"][0])                 # array([0, 0, 1, 0, 1])
+    >>> code = prn.ssrg(np.array([1, 0, 0, 0, 0]), fb, n_bits=31)
+    """
+
+    def __init__(self, entries):
+        entries = np.array(entries, dtype=CATALOG_DTYPE)
+        order = np.lexsort((entries["j"], entries["degree"]))
+        self.entries = entries[order]
+        self.entries.setflags(write=False)
+        degrees = self.entries["degree"]
+        self._degrees = {int(m): (int(np.searchsorted(degrees, m, 'left')),
+                                  int(np.searchsorted(degrees, m, 'right')))
+                         for m in np.unique(degrees)}
+        self._primitive = np.isin(self.entries["letter"], [c.encode() for c in PRIMITIVE_LETTERS])
+        self._by_exponent = np.argsort(self.entries["exponent"], kind="stable")
+        self._exponents = self.entries["exponent"][self._by_exponent]
+
+    def __len__(self):
+        return self.entries.size
+
+    def degrees(self):
+        """
+        Degrees of the sections of the table
+        """
+        return sorted(self._degrees)
+
+    def find(self, degree=None, exponent=None, letters=None, primitive=None):
+        """
+        Entries matching all the given conditions
+
+        :param degree: degree of the section
+        :param exponent: exponent to which the polynomials belong
+        :param letters: string of the accepted letters, e.g. 'GH'
+        :param primitive: True for the primitive polynomials only, False for the others
+        :return: structured array of the matching entries in the order of the table
+        """
+        idx = np.arange(self.entries.size)
+        if degree is not None:
+            lo, hi = self._degrees.get(int(degree), (0, 0))
+            idx = idx[lo:hi]
+        if exponent is not None:
+            lo = np.searchsorted(self._exponents, exponent, 'left')
+            hi = np.searchsorted(self._exponents, exponent, 'right')
+            idx = np.intersect1d(idx, self._by_exponent[lo:hi])
+        sel = np.ones(idx.size, dtype=bool)
+        if letters is not None:
+            sel &= np.isin(self.entries["letter"][idx], [c.encode() for c in letters])
+        if primitive is not None:
+            sel &= self._primitive[idx] == bool(primitive)
+        return self.entries[idx[sel]]
+
+    def primitive(self, degree):
+        """
+        Primitive polynomials of the degree *degree*, integers, see *fb_taps*
+        """
+        return [int(p) for p in self.find(degree=degree, primitive=True)["poly"]]
+
+    def feedback_vectors(self, degree, **args):
+        """
+        Feedback vectors of the matching entries of the section *degree*, the entries of a
+        smaller degree than *degree* are skipped
+
+        :param degree: degree of the section
+        :param args: conditions of *find* (*exponent*, *letters*, *primitive*)
+        :return: integer array of the shape (entries, degree), rows are *ssrg_fb* vectors
+        """
+        polys = self.find(degree=degree, **args)["poly"]
+        polys = [int(p) for p in polys if int(p).bit_length() - 1 == degree]
+        return np.array([fb_taps(p) for p in polys], dtype=int).reshape(-1, degree)
+
+
+def parse_octal(token):
+    """
+    Splits a polynomial written as in the table, e.g. '45', '45E' or '45e', into the octal
+    number and the letter of its irreducible polynomial
+
+    :param token: octal digits optionally followed by one letter of IRREDUCIBLE_LETTERS
+    :return: tuple (polynomial as an integer, upper case letter or '')
+    """
+    token = token.strip().upper()
+    digits = token.rstrip(IRREDUCIBLE_LETTERS)
+    letter = token[len(digits):]
+    try:
+        if len(letter) > 1:
+            raise ValueError(token)
+        return int(digits, 8), letter
+    except ValueError:
+        raise ValueError("polynomial '%s' can not be parsed" % token)
+
+
+def fb_taps(poly, reciprocal=False):
+    """
+    Feedback vector of the SSRG producing the sequences of the characteristic polynomial
+    *poly*, for X**m + c[m-1] X**(m-1) + ... + c[0] the vector is [c[m-1], ..., c[1], c[0]]
+
+    :param poly: polynomial as an integer (bit *k* holds the coefficient of X**k) or an
+                 octal string as listed in the table, e.g. '45' or '45E'
+    :param reciprocal: use the reciprocal polynomial X**m p(1/X) instead
+    :return: integer array of the length m, *ssrg_fb* of *build_srm* and *ssrg*
+    """
+    if isinstance(poly, str):
+        poly = parse_octal(poly)[0]
+    poly = int(poly)
+    m = poly.bit_length() - 1
+    if m < 1 or not poly & 1:
+        raise ValueError("polynomial %o has no feedback vector, the constant term is zero" % poly)
+    if reciprocal:
+        poly = int(format(poly, 'b')[::-1], 2)
+    return np.array([(poly >> k) & 1 for k in range(m - 1, -1, -1)], dtype=int)
@@ -1,6 +1,25 @@
 """
 Module provides sed are functions to generate trains of pulses of various shapes and parameters.
 Used are functions which generate single pulses.
+
+A train is the envelope (maximum) of single pulses weighted by the code. The trains are not
+built by evaluating every pulse over the whole time axis. For every sample only the pulses
+which can contribute to it are evaluated: the rectangular pulses overlapping the sample and,
+for the sinc and raised cosine pulses, a window of the nonzero pulses around the sample which
+is widened until the decay of the pulse tails guarantees that no pulse outside of the window
+can change the result. Pulses of the zero weight are skipped, so a sparse code costs no more
+than its nonzero pulses. Returned signals are the same as those of the direct chip by chip
+evaluation.
+
+The sinc and raised cosine trains optionally accept a pulse span in symbols. Every pulse
+is then truncated to the window of *span* symbol periods centered on the pulse, the pulse
+is precomputed once on the sampling grid and placed into slices of the output, so the cost
+is O(samples * span). The upper bound of the truncation error is logged and reported
+through the *stats* dictionary.
+
+The code may also be a 2-D array of the shape (pulses, components), e.g. the I and Q levels
+of complex symbols. Every pulse is then evaluated once and weighted by all the components,
+the returned train has the shape of the time axis extended by the components axis.
 """
 import sys
 sys.path.append("../../srcpy")
@@ -9,7 +28,7 @@ import numpy as np
 import logging
 from siggens import one_pulse as pulse
 
-def rect_tr(t, tp, ts, td, code):
+def rect_tr(t, tp, ts, td, code, **args):
     """
     Generates a train of rectangular pulses using the *one_pulse* function -> ''rect_p''
 
@@ -18,20 +37,38 @@ def rect_tr(t, tp, ts, td, code):
     :param ts: spaces in between pulses
     :param td: time delay, time between origin of the t axis and the first pulse rising edge
     :param code: binary sequence which will be coded
+    :param args: optional argument *first_pulse* (default 0), the index of the pulse of
+                 code[0] in a longer train, the pulse *i* of the train starts at
+                 ``td + i * (tp + ts)``; the edges are computed from the index in the whole
+                 train, so a part of the train equals the same samples of the whole one
     :return: baseband signal
     """
     logger = logging.getLogger(__name__)
-    n = np.size(code)
-    x = np.zeros(np.shape(t)) > 1
+    code = _as_code(code)
+    n = len(code)
+    first = int(args.get('first_pulse', 0))
     logger.debug("code length %s ", n)
-    logger.debug("oversampled signal length %s ", x.size)
-    for i1 in range(0, n):
-        p = pulse.rect_p(t, td + i1 * (tp + ts), td + tp + i1 * (tp + ts))
-        # x = (x | p & code[i1]) * 1
-        x = np.maximum(x, p * code[i1])
+    logger.debug("oversampled signal length %s ", np.size(t))
+    period = tp + ts
+    if n == 0 or period <= 0:
+        return _rect_tr_loop(t, tp, ts, td + first * period, code)
+
+    t = np.asarray(t)
+    x = np.zeros(np.shape(t) + code.shape[1:], dtype=np.result_type(np.int64, code.dtype))
+    # index of the pulse slot of every sample, the pulses started at most n_back
+    # slots earlier may still be on, one more slot on each side covers rounding
+    i0 = np.floor((t - td) / period).astype(np.int64) - first
+    n_back = int(np.ceil(tp / period))
+    for d in range(-1, n_back + 2):
+        i = i0 - d
+        valid = (i >= 0) & (i < n)
+        i = np.clip(i, 0, n - 1)
+        g = i + first  # index of the pulse in the whole train
+        p = (t > td + g * period) & (t < td + tp + g * period) & valid
+        x = np.maximum(x, _weighted(p, code[i], code.shape[1:]))
     return x
 
-def sinc_tr(t, ts, td, code, pw):
+def sinc_tr(t, ts, td, code, pw, **args):
     """
     Generates a train of cardinal sin pulses using the *one_pulse* function -> ''sinc_p''
 
@@ -40,17 +77,24 @@ def sinc_tr(t, ts, td, code, pw):
     :param td: time delay, time between origin of the t axis and the center of the first pulse
     :param code: binary sequence which will be coded
     :param pw: pulse width
+    :param args: optional arguments *span*, the length of the truncated pulse in symbols,
+                 and *stats*, a dictionary which is filled with the truncation error bound
     :return: baseband signal
     """
-    n = np.size(code)
-    x = np.zeros(np.shape(t))
-    for i1 in range(0, n):
-        p = pulse.sinc_p(t, td + i1 * (ts), pw)
-        # x = (x + p * code[i1])
-        x = np.maximum(x, p * code[i1])
-    return x
+    def kernel(tk, t0):
+        return pulse.sinc_p(tk, t0, pw)
+
+    def envelope(u):
+        return _sinc_envelope(u, pw)
+
+    code = _as_code(code)
+    if 'span' in args:
+        return _span_train(t, ts, td, code, kernel, envelope, args)
+    if np.size(code) == 0 or ts <= 0:
+        return _max_train_loop(t, ts, td, code, kernel)
+    return _max_train(t, ts, td, code, kernel, envelope)
 
-def rcos_tr(t, ts, td, code, pw, alpha):
+def rcos_tr(t, ts, td, code, pw, alpha, **args):
     """
     Generates a train of raised cosine pulses using the *one_pulse* function -> ''rcos_p''
 
@@ -60,12 +104,227 @@ def rcos_tr(t, ts, td, code, pw, alpha):
     :param code: binary sequence which will be coded
     :param pw: pulse width
     :param alpha: roll-off factor
+    :param args: optional arguments *span* and *stats*, see *sinc_tr*
+    :return: baseband signal
+    """
+    def kernel(tk, t0):
+        return pulse.rcos_p(tk, t0, pw, alpha)
+
+    def envelope(u):
+        # the damping factor of the raised cosine never exceeds one
+        env = _sinc_envelope(u, pw)
+        y2 = (2 * alpha / pw * u) ** 2
+        far = y2 > 2
+        env[far] = env[far] / (y2[far] - 1)
+        return env
+
+    def kernel_span(tk, t0):
+        # the truncated train takes the limit value pi/4 of the damping factor close to the 0/0
+        # points, where the direct evaluation loses its accuracy
+        p = np.asarray(kernel(tk, t0), dtype=float)
+        u = np.broadcast_to(tk - t0, p.shape)
+        near = np.abs(1 - (2 * alpha / pw * u) ** 2) < 1e-6
+        p[near] = pulse.sinc_p(u[near], 0.0, pw) * np.pi / 4
+        return p
+
+    code = _as_code(code)
+    # the 0/0 points of the damping factor are handled by the trains, they are not warned about
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'span' in args:
+            return _span_train(t, ts, td, code, kernel_span, envelope, args)
+        if np.size(code) == 0 or ts <= 0:
+            return _max_train_loop(t, ts, td, code, kernel)
+        # at the distance pw / (2 alpha) the damping factor is evaluated as 0/0
+        singular = (pw / (2 * alpha),) if alpha != 0 else ()
+        return _max_train(t, ts, td, code, kernel, envelope, singular)
+
+
+def _as_code(code):
+    # 1-D code of weights or 2-D code of the shape (pulses, components)
+    code = np.asarray(code)
+    return code if code.ndim == 2 else np.ravel(code)
+
+
+def _weighted(p, c, cols):
+    # pulse samples p weighted by the code values c, one column per component of the code
+    if not cols:
+        return p * c
+    return p[..., np.newaxis] * c
+
+
+def _sinc_envelope(u, pw):
+    # |sinc_p| <= 1 and |sin(x) / x| <= 1 / |x| with x = pi**2 * u / pw
+    with np.errstate(divide='ignore'):
+        return np.minimum(1.0, pw / (np.pi ** 2 * np.abs(u)))
+
+
+def _max_train(t, ts, td, code, kernel, envelope, singular=()):
+    """
+    Envelope of the pulses code[i] * kernel(t, td + i * ts), evaluates only the pulses which
+    can reach the maximum at the particular sample
+
+    :param t: time axis
+    :param ts: spaces in between pulses, positive
+    :param td: center of the first pulse
+    :param code: weights of the pulses, 1-D or 2-D of the shape (pulses, components)
+    :param kernel: function (t, t0) of a single pulse centered in t0
+    :param envelope: function of the distance from the pulse center, upper bound of |kernel|
+    :param singular: distances from the pulse center where the kernel is not finite
     :return: baseband signal
     """
-    n = np.size(code)
-    x = np.zeros(np.shape(t))
+    n = len(code)
+    t = np.asarray(t)
+    tf = np.ravel(t)
+    cols = code.shape[1:]
+    x = np.zeros((tf.size,) + cols, dtype=np.result_type(float, code.dtype))
+    c_max = np.max(np.abs(code), axis=0)
+
+    def apply(idx, i):
+        valid = (i >= 0) & (i < n)
+        idx = idx[valid]
+        i = i[valid]
+        p = kernel(tf[idx], td + i * ts)
+        x[idx] = np.maximum(x[idx], _weighted(p, code[i], cols))
+
+    samples = np.arange(tf.size)
+    for u in singular:
+        for s in (u, -u):
+            j_s = np.rint((tf - s - td) / ts).astype(np.int64)
+            for d in (-1, 0, 1):
+                apply(samples, j_s + d)
+
+    # pulses of the zero weight never raise the envelope above zero, the window runs over the
+    # nonzero pulses only, a sparse code costs as much as the code of its nonzero pulses
+    nz = np.flatnonzero(np.abs(code).reshape(n, -1).max(axis=1) > 0)
+    if nz.size == 0:
+        return x.reshape(np.shape(t) + cols)
+    m = nz.size
+    centers = td + nz * ts
+
+    # nearest nonzero pulse of every sample, the pulses j - w ... j + w of nz are evaluated
+    j = np.zeros(tf.size, dtype=np.int64)
+    if m > 1:
+        j = np.clip(np.searchsorted(centers, tf), 1, m - 1)
+        j -= (tf - centers[j - 1]) <= (centers[j] - tf)
+    active = samples
+    w_done = -1
+    w = 0
+    while active.size:
+        for d in range(w_done + 1, w + 1):
+            for k in ((j[active] + d, j[active] - d) if d else (j[active],)):
+                valid = (k >= 0) & (k < m)
+                apply(active[valid], nz[k[valid]])
+        w_done = w
+
+        lo = j[active] - w - 1  # nearest pulse on the left not evaluated yet
+        hi = j[active] + w + 1  # nearest pulse on the right not evaluated yet
+        lo = np.minimum(lo, m - 1)
+        hi = np.maximum(hi, 0)
+        t_act = tf[active]
+        dist = np.full(active.size, np.inf)
+        left = lo >= 0
+        dist[left] = t_act[left] - centers[lo[left]]
+        right = hi < m
+        dist[right] = np.minimum(dist[right], centers[hi[right]] - t_act[right])
+        bound = _weighted(envelope(dist), c_max, cols) * (1 + 1e-9)
+        x_act = x[active]
+        reached = ((x_act >= bound) | np.isnan(x_act)).reshape(active.size, -1).all(axis=1)
+        done = ~(left | right) | reached
+        active = active[~done]
+        w = 2 * w + 1
+    return x.reshape(np.shape(t) + cols)
+
+
+def truncation_error(envelope, ts, span, code):
+    """
+    Upper bound of the error of a pulse train caused by truncating the pulses to *span* symbols
+
+    :param envelope: function of the distance from the pulse center, upper bound of the pulse
+    :param ts: spaces in between pulses
+    :param span: length of the truncated pulse in symbols
+    :param code: weights of the pulses
+    :return: the largest possible difference between the truncated and the full train
+    """
+    if np.size(code) == 0:
+        return 0.0
+    return float(np.max(np.abs(code)) * envelope(np.array([span * ts / 2]))[0])
+
+
+def _span_train(t, ts, td, code, kernel, envelope, args):
+    """
+    Envelope of the pulses code[i] * kernel(t, td + i * ts) truncated to args['span'] symbols
+    """
+    logger = logging.getLogger(__name__)
+    span = float(args['span'])
+    half = span * ts / 2 * (1 + 1e-9)  # pulses end exactly on samples, keep the end sample
+    n = len(code)
+    t = np.asarray(t)
+    tf = np.ravel(t)
+    cols = code.shape[1:]
+    x = np.zeros((tf.size,) + cols, dtype=np.result_type(float, code.dtype))
+
+    err = truncation_error(envelope, ts, span, code)
+    logger.debug("pulse train truncated to %s symbols, truncation error bound %s", span, err)
+    if 'stats' in args:
+        args['stats'].update({"span": span, "truncation_error": err})
+    if n == 0 or tf.size == 0:
+        return x.reshape(np.shape(t) + cols)
+
+    dt = (tf[-1] - tf[0]) / (tf.size - 1) if tf.size > 1 else ts
+    uniform = tf.size > 1 and np.allclose(np.diff(tf), dt, rtol=1e-9, atol=0)
+    r = ts / dt
+    if uniform and r >= 1 and abs(r - np.rint(r)) < 1e-9 * r:
+        # every pulse sits at the same fractional position on the sampling grid,
+        # one precomputed pulse is placed into a slice of the output for every symbol
+        r = int(np.rint(r))
+        c0 = (td - tf[0]) / dt
+        b0 = int(np.floor(c0))
+        m_half = int(np.ceil(half / dt)) + 1
+        m = np.arange(-m_half, m_half + 1)
+        u = (b0 + m - c0) * dt
+        m = m[np.abs(u) <= half]
+        u = u[np.abs(u) <= half]
+        h = kernel(u, 0.0)
+        bad = ~np.isfinite(h)
+        if np.any(bad):
+            # removable singularities of the pulse, taken from a close neighbourhood
+            h[bad] = kernel(u[bad] + 1e-6 * dt, 0.0)
+        base = b0 + r * np.arange(n)
+        for mk, hk in zip(m, h):
+            idx = base + mk
+            valid = (idx >= 0) & (idx < tf.size)
+            idx = idx[valid]
+            x[idx] = np.maximum(x[idx], hk * code[valid])
+    else:
+        j = np.rint((tf - td) / ts).astype(np.int64)
+        w = int(np.ceil(span / 2)) + 1
+        for d in range(-w, w + 1):
+            i = j + d
+            sel = (i >= 0) & (i < n)
+            idx = np.flatnonzero(sel)
+            i = i[sel]
+            t0 = td + i * ts
+            near = np.abs(tf[idx] - t0) <= half
+            idx = idx[near]
+            i = i[near]
+            p = kernel(tf[idx], t0[near])
+            x[idx] = np.maximum(x[idx], _weighted(p, code[i], cols))
+    return x.reshape(np.shape(t) + cols)
+
+
+def _max_train_loop(t, ts, td, code, kernel):
+    n = len(code)
+    x = np.zeros(np.shape(t) + code.shape[1:])
     for i1 in range(0, n):
-        p = pulse.rcos_p(t, td + i1 * (ts), pw, alpha)
-        # x = (x + p * code[i1])
-        x = np.maximum(x, p * code[i1])
-    return (x)
+        p = kernel(t, td + i1 * (ts))
+        x = np.maximum(x, _weighted(p, code[i1], code.shape[1:]))
+    return x
+
+
+def _rect_tr_loop(t, tp, ts, td, code):
+    n = len(code)
+    x = np.zeros(np.shape(t) + code.shape[1:]) > 1
+    for i1 in range(0, n):
+        p = pulse.rect_p(t, td + i1 * (tp + ts), td + tp + i1 * (tp + ts))
+        x = np.maximum(x, _weighted(p, code[i1], code.shape[1:]))
+    return x
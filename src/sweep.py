@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""
+Batch mode of the runner, a sweep over a set of feedback polynomials.
+
+Every polynomial is handed to a pool of worker processes. A worker generates one period of
+the sequence by *PRN_bitstreams* and computes its periodic autocorrelation by *corrNumpy*.
+In the second pass the workers correlate the sequences of the same degree and period with
+each other. One summary row per polynomial is written into a CSV file:
+
+* *poly* - octal polynomial, *degree*, *letter* - letter of *polynomials.tab*,
+* *period* - period of the sequence started from the initial state,
+* *balance* - number of ones minus number of zeros in one period,
+* *peak_sidelobe* - the largest |R(k)|, k = 1 ... period - 1, of the periodic
+  autocorrelation of the +/-1 sequence,
+* *max_cross* - the largest |R(k)| of the periodic cross-correlation with the other
+  sequences of the same degree and period, *n_cross* - number of those sequences.
+
+The polynomials are given in the [sweep] section of *analysis.cnf*, either as a list of
+octal numbers or as a degree whose entries are taken from *polynomials.tab*.
+"""
+import os
+import csv
+import logging
+import concurrent.futures
+import numpy as np
+
+from siggens import PRN_bitstreams as prn
+from siggens import polynomials as pl
+from dsp import corrNumpy as ncorr
+
+SUMMARY_FIELDS = ("poly", "degree", "letter", "period", "balance", "peak_sidelobe",
+                  "max_cross", "n_cross")
+
+
+def sequence_period(init_reg, fb_reg):
+    """
+    Period of the sequence of the SSRG, the number of steps until the register returns
+    to its initial state
+
+    :param init_reg: initial state of the shift register
+    :param fb_reg: feedback vector, bit '1' means -> FB is connected
+    :return: period, 0 when the initial state never comes back
+    """
+    nob = np.size(init_reg)
+    words = prn.ssrg_trajectory(init_reg, fb_reg, 2 ** nob - 1)
+    hits = np.flatnonzero(words == np.uint64(prn.pack_state(init_reg)))
+    return int(hits[0]) + 1 if hits.size else 0
+
+
+def code_summary(poly, letter="", init_reg=None):
+    """
+    Generates one period of the sequence of a polynomial and summarizes its autocorrelation
+
+    :param poly: polynomial as an integer, see *polynomials.fb_taps*
+    :param letter: letter of the polynomial in *polynomials.tab*
+    :param init_reg: initial state of the shift register, [1, 0, ..., 0] when None
+    :return: tuple (row, chips), row is a dictionary of SUMMARY_FIELDS without the
+             cross-correlation, chips is one period of the sequence
+    """
+    fb = pl.fb_taps(poly)
+    m = fb.size
+    if init_reg is None or np.size(init_reg) != m:
+        init_reg = np.zeros(m, dtype=int)
+        init_reg[0] = 1
+    period = sequence_period(init_reg, fb)
+    n = period if period else 2 ** m - 1
+    chips, _ = prn.lfsr_chips(prn.pack_state(init_reg), prn.pack_state(fb), m, n)
+    ones = int(np.count_nonzero(chips))
+    sidelobe = 0
+    if n > 1:
+        a = ncorr.corr_fd(_bipolar(chips), _bipolar(chips), cache=False)
+        sidelobe = int(np.max(np.abs(np.rint(a[1:]))))
+    row = {"poly": "%o" % poly, "degree": m, "letter": letter, "period": period,
+           "balance": 2 * ones - n, "peak_sidelobe": sidelobe, "max_cross": 0, "n_cross": 0}
+    return row, chips
+
+
+def cross_peaks(chips, others):
+    """
+    The largest |R(k)| of the periodic cross-correlation of a sequence with each of others
+
+    :param chips: binary sequence
+    :param others: binary sequences of the same length, array of the shape (codes, chips)
+    :return: integer array, one peak per sequence of *others*
+    """
+    x2 = _bipolar(chips)
+    peaks = np.zeros(len(others), dtype=int)
+    for i, other in enumerate(others):
+        c = ncorr.corr_fd(_bipolar(other), x2)
+        peaks[i] = int(np.max(np.abs(np.rint(c))))
+    return peaks
+
+
+def _bipolar(chips):
+    return 1.0 - 2.0 * np.asarray(chips, dtype=float)
+
+
+def _summary_task(args):
+    return code_summary(*args)
+
+
+def _cross_task(args):
+    # sequences are passed bit-packed to keep the data sent to the workers small
+    k, n, chips, others = args
+    chips = np.unpackbits(chips, count=n)
+    others = np.unpackbits(others, axis=-1, count=n)
+    return k, cross_peaks(chips, others)
+
+
+def poly_sweep(polys, init_reg=None, workers=None):
+    """
+    Summarizes the correlation properties of the sequences of many polynomials in parallel
+
+    :param polys: list of polynomials, integers or tuples (polynomial, letter)
+    :param init_reg: initial state of the shift registers of the matching degree
+    :param workers: number of worker processes, all processors when None, 1 runs the
+                    sweep in the calling process
+    :return: list of summary rows (dictionaries of SUMMARY_FIELDS) in the order of *polys*
+    """
+    logger = logging.getLogger(__name__)
+    polys = [p if isinstance(p, tuple) else (p, "") for p in polys]
+    tasks = [(int(p), letter, init_reg) for p, letter in polys]
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    logger.debug("polynomial sweep, %s polynomials, %s workers", len(tasks), workers)
+
+    with _executor(workers) as ex:
+        results = list(ex.map(_summary_task, tasks, chunksize=max(len(tasks) // (4 * workers), 1)))
+        rows = [r for r, _ in results]
+
+        # sequences of the same degree and period are cross-correlated, every pair once
+        groups = {}
+        for i, row in enumerate(rows):
+            groups.setdefault((row["degree"], row["period"]), []).append(i)
+        cross_tasks = []
+        for members in groups.values():
+            if len(members) > 1:
+                codes = np.packbits(np.array([results[i][1] for i in members]), axis=-1)
+                n = results[members[0]][1].size
+                cross_tasks += [(members, (k, n, codes[k], codes[k + 1:]))
+                                for k in range(len(members) - 1)]
+        peaks = ex.map(_cross_task, [t for _, t in cross_tasks],
+                       chunksize=max(len(cross_tasks) // (4 * workers), 1))
+        for (members, _), (k, pk) in zip(cross_tasks, peaks):
+            for other, p in zip(members[k + 1:], pk):
+                for a in (members[k], other):
+                    rows[a]["max_cross"] = max(rows[a]["max_cross"], int(p))
+                    rows[a]["n_cross"] += 1
+    logger.debug("polynomial sweep finished")
+    return rows
+
+
+def _executor(workers):
+    if workers == 1:
+        return _InlineExecutor()
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+
+class _InlineExecutor:
+    # runs the tasks in the calling process, the interface of the pool used by poly_sweep
+
+    def map(self, fn, iterable, chunksize=1):
+        return map(fn, iterable)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+def write_summary(rows, filename):
+    """
+    Writes the summary rows of *poly_sweep* into a CSV file
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def sweep_polynomials(analysis_setup, setup_data):
+    """
+    Polynomials of the sweep configured in *analysis.cnf*
+
+    :return: list of tuples (polynomial, letter)
+    """
+    if analysis_setup["sweep_polys"]:
+        return [pl.parse_octal(p) for p in analysis_setup["sweep_polys"]]
+    catalog = pl.load_catalog(setup_data["poly_table"], setup_data["cache_dir"])
+    degree = analysis_setup["sweep_degree"]
+    if analysis_setup["sweep_primitive"]:
+        entries = catalog.find(degree=degree, primitive=True)
+    else:
+        entries = catalog.find(degree=degree)
+    return [(int(e["poly"]), e["letter"].decode()) for e in entries
+            if int(e["poly"]).bit_length() - 1 == degree]
+
+
+def main(setup_data, analysis_setup):
+    logger = logging.getLogger(__name__)
+    polys = sweep_polynomials(analysis_setup, setup_data)
+    logger.info("Polynomial sweep started, %s polynomials", len(polys))
+    init_reg = np.asarray(analysis_setup["ssrg_init"]).ravel()
+    rows = poly_sweep(polys, init_reg, analysis_setup["sweep_workers"])
+    write_summary(rows, setup_data["data_sweep"])
+    logger.info("Polynomial sweep summary written to %s", setup_data["data_sweep"])
+    return rows
@@ -1,5 +1,13 @@
-import matplotlib.pyplot as plt
-# import numpy as np
+"""
+Plots of the analysis results.
+
+Long traces are reduced before they are passed to matplotlib. The samples are split into
+as many bins as the axes have pixels in width and only the minimum and the maximum of every
+bin are drawn, in their original order. The drawn envelope of the trace is the same as the
+one of all the samples, while the number of points is bounded by twice the pixel width of
+the axes, see *minmax_decimate*.
+"""
+import numpy as np
 
 default_timedomain_texts = {"y_legend":"$y(t)$",
                             "title": "Time-domain plot",
@@ -7,14 +15,84 @@ default_timedomain_texts = {"y_legend":"$y(t)$",
                             "x_label": "time [ms]"
                             }
 
+
+def minmax_decimate(x, y, n_bins):
+    """
+    Min/max envelope decimation of a trace
+
+    :param x: x axis of the trace
+    :param y: samples of the trace, real
+    :param n_bins: number of bins, e.g. the pixel width of the axes
+    :return: tuple (x, y) of at most 2 * n_bins + 4 points, the minimum and the maximum of
+             every bin of consecutive samples and the first and the last sample in the order
+             of the samples, the trace itself when it is not longer than 2 * n_bins
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = y.size
+    if n_bins < 1 or n <= 2 * n_bins:
+        return x, y
+    k = n // n_bins  # samples per bin, the rest of the samples forms one more bin
+    m = n_bins * k
+    start = np.arange(n_bins) * k
+    y_bins = y[:m].reshape(n_bins, k)
+    idx = [np.argmin(y_bins, axis=1) + start, np.argmax(y_bins, axis=1) + start, [0, n - 1]]
+    if m < n:
+        idx.append(np.array([np.argmin(y[m:]), np.argmax(y[m:])]) + m)
+    idx = np.unique(np.concatenate(idx))  # sorted, the bins follow each other
+    return x[idx], y[idx]
+
+
+def visible_samples(x, y, x_min, x_max):
+    """
+    Samples of a trace within the x limits of the axes
+
+    :param x: x axis of the trace, ascending
+    :param y: samples of the trace
+    :param x_min: lower x limit of the axes
+    :param x_max: upper x limit of the axes
+    :return: tuple (x, y) of the samples between the limits and the nearest sample outside
+             on either side, so the drawn line reaches the borders of the axes
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    lo = max(np.searchsorted(x, min(x_min, x_max), side='left') - 1, 0)
+    hi = np.searchsorted(x, max(x_min, x_max), side='right') + 1
+    return x[lo:hi], y[lo:hi]
+
+
+def axes_width_px(figaxis):
+    """
+    Width of the axes in the pixels of the figure (dots at the dpi of the figure)
+    """
+    return int(np.ceil(figaxis.get_window_extent().width))
+
+
 def timedomain_plot(figaxis,x,y,**kwargs):
+    """
+    Plots a trace into the axes
+
+    :param figaxis: matplotlib axes
+    :param x: x axis
+    :param y: samples of the trace
+    :param kwargs: *texts* - dictionary of the texts, see *default_timedomain_texts*,
+                   *axes* - limits of the axes, *decimate* - min/max envelope decimation
+                   to the pixel width of the axes (default True), only the samples within
+                   the x limits of *axes* are decimated and drawn, switch the decimation off
+                   for figures zoomed interactively
+    """
+    if kwargs.get("decimate", True):
+        if "axes" in kwargs:
+            x, y = visible_samples(x, y, kwargs["axes"][0], kwargs["axes"][1])
+        x, y = minmax_decimate(x, y, axes_width_px(figaxis))
+
     if "y_legend" in kwargs["texts"]:
         figaxis.plot(x, y, '-k', label=kwargs["texts"]["y_legend"])
     else:
         figaxis.plot(x, y, '-k')
 
     if "title" in kwargs["texts"]:
-        plt.title(kwargs["texts"]["title"], loc='left')
+        figaxis.set_title(kwargs["texts"]["title"], loc='left')
 
     if "y_label" in kwargs["texts"]:
         figaxis.set_ylabel(kwargs["texts"]["y_label"])
@@ -25,4 +103,4 @@ def timedomain_plot(figaxis,x,y,**kwargs):
     figaxis.grid(True)
     lgd = figaxis.legend(loc='upper right', bbox_to_anchor=(1.12, 1.35))
     if "axes" in kwargs:
-        figaxis.axis(kwargs["axes"])
\ No newline at end of file
+        figaxis.axis(kwargs["axes"])
@@ -0,0 +1,179 @@
+"""
+Content-addressed on-disk cache of generated PRN codes and pulse-shaped waveforms.
+
+Entries are keyed by a hash of the parameters they were generated from (feedback taps,
+initial state, length, pulse shape, sampling parameters, ...). Codes are stored bit-packed
+in compressed *.npz* files, waveforms as plain *.npy* files which are reloaded memory-mapped.
+When the total size of the cache exceeds the limit the least recently used entries are
+removed.
+"""
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+# bump to invalidate entries written by an incompatible version of the generators
+CACHE_VERSION = 1
+
+_HEX = frozenset("0123456789abcdef")
+
+
+class CodeCache:
+    """
+    Cache of codes and waveforms in the folder *cache_dir*
+
+    :param cache_dir: folder of the cache, created when missing
+    :param max_bytes: size limit of the cache in bytes (default 512 MB)
+
+    **Example:**
+
+    >>> cache = CodeCache("../cache/")
+    >>> params = {"ssrg_init": [1, 0, 0, 0, 0], "ssrg_fb": [0, 0, 1, 0, 1], "n_bits": 62}
+    >>> code = cache.get_code(params)
+    >>> if code is None:
+    ...     code = generate(params)
+    ...     cache.put_code(params, code)
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(kind, params):
+        """
+        Content address of an entry
+
+        :param kind: kind of the entry, 'code' or 'waveform'
+        :param params: dictionary of the parameters the entry was generated from
+        :return: hexadecimal digest
+        """
+        canonical = json.dumps({"kind": kind, "version": CACHE_VERSION, "params": params},
+                               sort_keys=True, default=_to_json)
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    def get_code(self, params):
+        """
+        Reads a code from the cache
+
+        :param params: dictionary of the parameters the code was generated from
+        :return: the code with its original dtype, None when not cached
+        """
+        path = self._path('code', params, '.npz')
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            n = int(f['n'])
+            code = np.unpackbits(f['bits'], count=n).astype(str(f['dtype']))
+        self._touch(path)
+        logging.getLogger(__name__).debug("code %s read from the cache", os.path.basename(path))
+        return code
+
+    def put_code(self, params, code):
+        """
+        Stores a binary code into the cache, bit-packed and compressed
+
+        :param params: dictionary of the parameters the code was generated from
+        :param code: binary sequence
+        """
+        code = np.ravel(code)
+        path = self._path('code', params, '.npz')
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, bits=np.packbits(code != 0), n=code.size, dtype=code.dtype.str)
+        os.replace(tmp, path)
+        self.evict()
+
+    def get_waveform(self, params):
+        """
+        Reads a waveform from the cache, memory-mapped read-only
+
+        :param params: dictionary of the parameters the waveform was generated from
+        :return: waveform, None when not cached
+        """
+        path = self._path('waveform', params, '.npy')
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        logging.getLogger(__name__).debug("waveform %s read from the cache", os.path.basename(path))
+        return np.load(path, mmap_mode='r')
+
+    def put_waveform(self, params, waveform):
+        """
+        Stores a waveform into the cache
+
+        :param params: dictionary of the parameters the waveform was generated from
+        :param waveform: numpy array
+        """
+        path = self._path('waveform', params, '.npy')
+        tmp = path + '.tmp.npy'
+        np.save(tmp, np.asarray(waveform))
+        os.replace(tmp, path)
+        self.evict()
+
+    def invalidate(self, kind=None, params=None):
+        """
+        Removes one entry or, called without arguments, the whole content of the cache
+
+        :param kind: kind of the entry, 'code' or 'waveform'
+        :param params: dictionary of the parameters the entry was generated from
+        """
+        if kind is None:
+            for name, _, _ in self._entries():
+                os.remove(os.path.join(self.cache_dir, name))
+            return
+        for ext in ('.npz', '.npy'):
+            path = self._path(kind, params, ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def size(self):
+        """
+        Total size of the cache in bytes
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits into *max_bytes*
+        """
+        logger = logging.getLogger(__name__)
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.max_bytes:
+            name, size, _ = entries.pop(0)
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            logger.debug("cache entry %s evicted", name)
+
+    def _path(self, kind, params, ext):
+        return os.path.join(self.cache_dir, self.key(kind, params) + ext)
+
+    def _entries(self):
+        # only the files named by a key are entries, other files sharing the folder (e.g. the
+        # polynomial catalog) are never counted, evicted or removed
+        out = []
+        for name in os.listdir(self.cache_dir):
+            if _is_entry(name):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                out.append((name, st.st_size, st.st_mtime))
+        return out
+
+    @staticmethod
+    def _touch(path):
+        # the modification time keeps the order of the last use
+        os.utime(path, None)
+
+
+def _is_entry(name):
+    key, ext = os.path.splitext(name)
+    return ext in ('.npz', '.npy') and len(key) == 40 and all(c in _HEX for c in key)
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("parameter of the type %s can not be hashed" % type(value))
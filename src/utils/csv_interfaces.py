@@ -1,6 +1,28 @@
 #!/usr/bin/env python
+"""
+Writers of the SSRG state and code outputs.
+
+*write_csv* appends one row per call, reopening the file every time. *BufferedWriter* keeps
+the file open, collects rows and writes them in bulk every *flush_rows* rows. Besides the
+CSV format it writes two binary formats:
+
+* ``'npy'`` - rows appended to a *.npy* file of the type uint8, one row per iteration,
+  the array header is updated when the writer is closed,
+* ``'bits'`` - rows bit-packed into one continuous stream behind a short header, read
+  back by *read_packed*.
+"""
 
 import csv
+import struct
+import numpy as np
+
+# extensions of the files written in particular formats
+OUTPUT_EXTENSIONS = {"csv": ".csv", "npy": ".npy", "bits": ".bin"}
+
+_NPY_HEADER_LEN = 128
+_BITS_MAGIC = b'PKBT'
+_BITS_HEADER = struct.Struct('<4sIQ')  # magic, row width in bits, number of rows
+
 
 def write_csv(m1, filename, iter):
     if iter == 1:
@@ -12,3 +34,157 @@ def write_csv(m1, filename, iter):
         with open (filename, 'a', newline='') as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow((iter, m1.T))
+
+
+def output_filename(filename, fmt):
+    """
+    Replaces the extension of the file name by the one of the output format
+
+    :param filename: file name
+    :param fmt: output format, 'csv', 'npy' or 'bits'
+    :return: file name
+    """
+    root = filename.rsplit('.', 1)[0] if '.' in filename.rsplit('/', 1)[-1] else filename
+    return root + OUTPUT_EXTENSIONS[fmt]
+
+
+class BufferedWriter:
+    """
+    Writer keeping the output file open and writing the rows in batches
+
+    :param filename: output file, rewritten
+    :param fmt: output format, 'csv' (default), 'npy' or 'bits'
+    :param flush_rows: number of rows collected before they are written (default 4096)
+
+    **Example:**
+
+    >>> with BufferedWriter("state_output.npy", fmt="npy") as w:
+    ...     for i1 in range(1, n):
+    ...         x = prn.proceed_ssrg_onestep(x, srm)
+    ...         w.write(x, i1)
+    """
+
+    def __init__(self, filename, fmt='csv', flush_rows=4096):
+        if fmt not in OUTPUT_EXTENSIONS:
+            raise ValueError("Unknown output format '%s', use 'csv', 'npy' or 'bits'" % fmt)
+        self.filename = filename
+        self.fmt = fmt
+        self.flush_rows = max(int(flush_rows), 1)
+        self.n_rows = 0
+        self.width = None
+        self._rows = []
+        self._bits = np.zeros(0, dtype=np.uint8)  # bits not packed yet, 'bits' format only
+        if fmt == 'csv':
+            self._file = open(filename, 'w', newline='')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(('iteration', 'ssrg_state'))
+        else:
+            self._file = open(filename, 'wb')
+            self._file.write(self._header())
+
+    def write(self, m1, iter):
+        """
+        Adds one row, the same arguments as *write_csv*
+
+        :param m1: state of the register (column vector) or an output bit
+        :param iter: number of the iteration
+        """
+        if self.fmt == 'csv':
+            self._rows.append((iter, m1.T))
+        else:
+            self._rows.append(np.asarray(m1, dtype=np.uint8).ravel())
+        if len(self._rows) >= self.flush_rows:
+            self.flush()
+
+    def write_rows(self, rows, first_iter=1):
+        """
+        Adds many rows at once, binary formats take them without any per-row conversion
+
+        :param rows: array of the shape (rows, width) or (rows,)
+        :param first_iter: number of the iteration of the first row
+        """
+        rows = np.asarray(rows)
+        if self.fmt == 'csv':
+            for i, row in enumerate(rows):
+                self._rows.append((first_iter + i, np.matrix(row)))
+        else:
+            self.flush()
+            self._write_binary(rows.astype(np.uint8).reshape(rows.shape[0], -1))
+        if len(self._rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the collected rows into the file
+        """
+        if self._rows:
+            if self.fmt == 'csv':
+                self._csv.writerows(self._rows)
+                self.n_rows += len(self._rows)
+            else:
+                self._write_binary(np.vstack(self._rows))
+            self._rows = []
+        self._file.flush()
+
+    def close(self):
+        """
+        Writes the rest of the rows, completes the header of binary files and closes the file
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        if self.fmt == 'bits' and self._bits.size:
+            self._file.write(np.packbits(self._bits).tobytes())
+            self._bits = np.zeros(0, dtype=np.uint8)
+        if self.fmt != 'csv':
+            self._file.seek(0)
+            self._file.write(self._header())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_binary(self, rows):
+        if self.width is None:
+            self.width = rows.shape[1]
+        elif rows.shape[1] != self.width:
+            raise ValueError("Row width %s differs from %s" % (rows.shape[1], self.width))
+        self.n_rows += rows.shape[0]
+        if self.fmt == 'npy':
+            self._file.write(rows.tobytes())
+            return
+        # 'bits', only complete bytes are written, the remaining bits wait for the next rows
+        bits = np.concatenate((self._bits, rows.ravel() & 1))
+        n_full = bits.size // 8 * 8
+        self._file.write(np.packbits(bits[:n_full]).tobytes())
+        self._bits = bits[n_full:]
+
+    def _header(self):
+        width = self.width if self.width is not None else 0
+        if self.fmt == 'bits':
+            return _BITS_HEADER.pack(_BITS_MAGIC, width, self.n_rows)
+        shape = (self.n_rows,) if width == 1 else (self.n_rows, width)
+        d = "{'descr': '|u1', 'fortran_order': False, 'shape': %r, }" % (shape,)
+        hlen = _NPY_HEADER_LEN - 10
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', hlen) + (d.ljust(hlen - 1) + '\n').encode('latin1')
+
+
+def read_packed(filename):
+    """
+    Reads a file written by *BufferedWriter* in the 'bits' format
+
+    :param filename: file name
+    :return: array of the type uint8 of the shape (rows, width), (rows,) for the width 1
+    """
+    with open(filename, 'rb') as f:
+        magic, width, n_rows = _BITS_HEADER.unpack(f.read(_BITS_HEADER.size))
+        if magic != _BITS_MAGIC:
+            raise ValueError("%s is not a packed bits file" % filename)
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+    bits = np.unpackbits(data, count=width * n_rows)
+    if width == 1:
+        return bits
+    return bits.reshape(n_rows, width)
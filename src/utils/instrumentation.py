@@ -0,0 +1,137 @@
+"""
+Timing and memory instrumentation of the stages of a run.
+
+A run is split into named stages (coder, pulse shaping, correlation, plotting, ...). Every
+stage is timed by the wall clock and by the process CPU time, items processed by the stage
+(chips, samples) are counted and, when the memory tracing is switched on, the peak of the
+memory allocated during the stage is measured by *tracemalloc*. Optionally the whole run is
+profiled by *cProfile* and the statistics are stored into a file readable by *pstats*.
+
+The summary of the run is written into the log at the INFO level, one line per stage, in the
+order the stages were entered. The instrumentation is configured by the [instrumentation]
+section of *setup.cnf*, with every switch off the stages cost two clock readings.
+
+**Example:**
+
+>>> ins = Instrumentation(memory=True)
+>>> with ins.stage("coder"):
+...     code = prn.ssrg(init, fb, n_bits=n)
+...     ins.count("coder", "chips", code.size)
+>>> ins.report()
+"""
+import time
+import logging
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    """
+    Stage timers, counters and optional memory tracing and profiling of one run
+
+    :param timers: record the stages, when False *stage* only runs the block
+    :param memory: measure the peak memory of every stage by *tracemalloc*
+    :param profile: file the *cProfile* statistics of the run are written into, no
+                    profiling when None
+    """
+
+    def __init__(self, timers=True, memory=False, profile=None):
+        self.timers = timers
+        self.memory = memory
+        self.profile_file = profile
+        self.stages = {}  # name -> dictionary of the stage records, in the order of entry
+        self._profiler = None
+        self._t_start = time.perf_counter()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _record(self, name):
+        return self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                             "peak_bytes": 0, "counters": {}})
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager timing the block as the stage *name*, repeated entries of the same
+        stage are added up
+        """
+        if not self.timers:
+            yield
+            return
+        rec = self._record(name)
+        if self.memory:
+            tracemalloc.reset_peak()
+            mem0, _ = tracemalloc.get_traced_memory()
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield
+        finally:
+            rec["wall_s"] += time.perf_counter() - wall0
+            rec["cpu_s"] += time.process_time() - cpu0
+            rec["calls"] += 1
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                rec["peak_bytes"] = max(rec["peak_bytes"], peak - mem0)
+
+    def add_time(self, name, seconds):
+        """
+        Adds the time measured outside of *stage* (e.g. the imports before the instrumentation
+        was created) to the stage *name*
+        """
+        if self.timers:
+            rec = self._record(name)
+            rec["wall_s"] += seconds
+            rec["calls"] += 1
+            self._t_start -= seconds  # the total of the run includes the added time
+
+    def count(self, name, item, n):
+        """
+        Adds *n* to the counter *item* (e.g. 'chips', 'samples') of the stage *name*
+        """
+        if self.timers:
+            counters = self._record(name)["counters"]
+            counters[item] = counters.get(item, 0) + int(n)
+
+    def summary(self):
+        """
+        Records of the stages and the total time of the run
+
+        :return: dictionary with the keys *stages* (name -> record) and *total_s*
+        """
+        return {"stages": self.stages, "total_s": time.perf_counter() - self._t_start}
+
+    def report(self, logger=None):
+        """
+        Writes the summary of the run into the log, stops the memory tracing and profiling
+
+        :param logger: logger of the summary, the logger of this module when None
+        """
+        logger = logger or logging.getLogger(__name__)
+        self.close()
+        s = self.summary()
+        total = s["total_s"]
+        logger.info("Run summary, total %.3f s", total)
+        for name, rec in s["stages"].items():
+            rates = ", ".join("%s %s (%.3g/s)" % (item, n, n / rec["wall_s"] if rec["wall_s"] else 0)
+                              for item, n in rec["counters"].items())
+            mem = ", peak %.1f MB" % (rec["peak_bytes"] / 2 ** 20) if self.memory else ""
+            logger.info("stage %-16s %9.3f s (%5.1f %%), cpu %9.3f s%s%s", name, rec["wall_s"],
+                        100 * rec["wall_s"] / total if total else 0, rec["cpu_s"], mem,
+                        ", " + rates if rates else "")
+
+    def close(self):
+        """
+        Stops the profiler and writes its statistics, stops the memory tracing
+        """
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_file)
+            logging.getLogger(__name__).info("cProfile statistics written to %s", self.profile_file)
+            self._profiler = None
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -3,6 +3,7 @@ import argparse
 import logging
 import logging.config
 import numpy as np
+from siggens import polynomials as pl
 
 
 def setup_cnf_file_parser(cnf_file):
@@ -20,6 +21,8 @@ def setup_cnf_file_parser(cnf_file):
     path_cnf = config.get('paths', 'config_dir')
     # Read a path to a folder with data
     path_log = config.get('paths', 'logger_dir')
+    # Read a path to a folder with cached codes and waveforms
+    path_cache = config.get('paths', 'cache_dir', fallback='cache/')
 
     # Read a name of the csv file where a sequence of the ssrg states is stored
     filename_state = config.get('filenames', 'ssrg_state_output_filename')
@@ -27,6 +30,14 @@ def setup_cnf_file_parser(cnf_file):
     filename_code = config.get('filenames', 'coder_output_filename')
     # Read a name of the log file where an output of the logger is directed
     filename_log = config.get('filenames', 'logger_filename')
+    # Read a name of the csv file where the summary of the polynomial sweep is stored
+    filename_sweep = config.get('filenames', 'sweep_output_filename', fallback='sweep_summary.csv')
+    # Read a name of the csv file where the results of the BER simulation are stored
+    filename_ber = config.get('filenames', 'ber_output_filename', fallback='ber_curve.csv')
+    # Read a name of the memory-mapped file of the pulse-shaped waveform
+    filename_waveform = config.get('filenames', 'waveform_output_filename', fallback='waveform.npy')
+    # Read a name of the table of irreducible and primitive polynomials
+    filename_poly = config.get('filenames', 'polynomial_table_filename', fallback='polynomials.tab')
     # Read a name of the cnf file to configure coder and analysis
     filename_cnf = config.get('filenames', 'config_filename')
     # Read a name of the cnf file to setup basic paths to files
@@ -34,14 +45,43 @@ def setup_cnf_file_parser(cnf_file):
     # Read a name of the cnf file to configure logger
     filename_plt_cnf = config.get('filenames', 'plotting_filename')
 
+    # Read a format of the ssrg state and coder outputs
+    output_format = config.get('output', 'output_format', fallback='csv').lower()
+    flush_rows = int(config.get('output', 'flush_rows', fallback='4096'))
+    waveform_format = config.get('output', 'waveform_format', fallback='off').lower()
+
+    # Read a setup of the cache of generated codes and waveforms
+    cache_switch = config.get('cache', 'cache_switch', fallback='off').lower()
+    cache_max_mb = float(config.get('cache', 'max_size_mb', fallback='512'))
+
+    # Read a setup of the instrumentation of the run stages
+    timers = config.get('instrumentation', 'stage_timers', fallback='on').lower() == 'on'
+    trace_memory = config.get('instrumentation', 'trace_memory', fallback='off').lower() == 'on'
+    profile = config.get('instrumentation', 'profile', fallback='off').lower() == 'on'
+    filename_profile = config.get('instrumentation', 'profile_filename', fallback='run.pstats')
+
     setup_data = {"srcpy": path_home + path_srcpy,
                   "data_path": path_home + path_data,
                   "data_state": path_home + path_data + filename_state,
                   "data_code": path_home + path_data + filename_code,
+                  "data_sweep": path_home + path_data + filename_sweep,
+                  "data_ber": path_home + path_data + filename_ber,
+                  "poly_table": path_home + path_data + filename_poly,
                   "setup":path_home + path_cnf + filename_setup,
                   "cnf": path_home + path_cnf + filename_cnf,
                   "log": path_home + path_log + filename_log,
-                  "plt": path_home + path_cnf + filename_plt_cnf}
+                  "plt": path_home + path_cnf + filename_plt_cnf,
+                  "output_format": output_format,
+                  "flush_rows": flush_rows,
+                  "data_waveform": path_home + path_data + filename_waveform,
+                  "waveform_format": None if waveform_format == 'off' else waveform_format,
+                  "cache_dir": path_home + path_cache,
+                  "cache": cache_switch in ('on', 'clear'),
+                  "cache_clear": cache_switch == 'clear',
+                  "cache_max_bytes": int(cache_max_mb * 2**20),
+                  "timers": timers,
+                  "trace_memory": trace_memory,
+                  "profile_file": path_home + path_log + filename_profile if profile else None}
     return setup_data
 
 
@@ -54,6 +94,13 @@ def parse_CMDLine():
     #      Read command line arguments to get a scenario
     parser.add_argument("-s", "--setup_file", help='''Define a path and filename to 
                                                       initial setup cnf file.''')
+    parser.add_argument("-b", "--batch", nargs="?", const="sweep", choices=("sweep", "ber"),
+                        help='''Batch mode instead of a single run, sweep (default) of
+                                the polynomials of the [sweep] section or the BER
+                                simulation of the [ber] section of the analysis cnf file.''')
+    parser.add_argument("--headless", action="store_true",
+                        help='''Non-interactive plotting backend, the plots are saved
+                                but never shown. Batch runs are always headless.''')
     argv = parser.parse_args()
 
     if argv.setup_file:
@@ -61,7 +108,7 @@ def parse_CMDLine():
     else:
         setup_file = "setup.cnf"
 
-    return setup_file
+    return setup_file, argv.batch, argv.headless or bool(argv.batch)
 
 
 def logger_setup(cnf_logger_file):
@@ -79,7 +126,35 @@ def analysis_cnf_file_parser(cnf_file):
     n_o_periods = int(config.get('coder', 'number_of_periods'))
     ssrg_init = np.matrix(np.fromstring(config.get('coder', 'ssrg_init'), dtype=int, sep=','))
     poly_degree = ssrg_init.size
-    ssrg_fb = np.matrix(np.fromstring(config.get('coder', 'ssrg_fb'), dtype=int, sep=','))
+    if config.has_option('coder', 'ssrg_poly'):
+        # feedback taps given by the octal polynomial of data/polynomials.tab, e.g. 45 or 45E
+        ssrg_poly = config.get('coder', 'ssrg_poly').strip()
+        ssrg_fb = np.matrix(pl.fb_taps(ssrg_poly))
+        if ssrg_fb.size != poly_degree:
+            raise ValueError("ssrg_poly %s of degree %s does not fit ssrg_init of %s stages"
+                             % (ssrg_poly, ssrg_fb.size, poly_degree))
+    else:
+        ssrg_fb = np.matrix(np.fromstring(config.get('coder', 'ssrg_fb'), dtype=int, sep=','))
+
+    # polynomials of the batch sweep, octal numbers or all the entries of one degree of the table
+    sweep_polys = [p.strip() for p in config.get('sweep', 'polynomials', fallback='').split(',')
+                   if p.strip()]
+    sweep_degree = int(config.get('sweep', 'degree', fallback=str(poly_degree)))
+    sweep_primitive = config.get('sweep', 'primitive_only', fallback='on').lower() == 'on'
+    sweep_workers = int(config.get('sweep', 'workers', fallback='0'))
+
+    # Eb/N0 points and the options of the BER simulation
+    ber_ebn0_db = [float(e) for e in config.get('ber', 'ebn0_db', fallback='0,2,4,6,8,10').split(',')
+                   if e.strip()]
+    ber_seed = config.get('ber', 'seed', fallback='').strip()
+    ber_seed = int(ber_seed) if ber_seed else None
+    ber_workers = int(config.get('ber', 'workers', fallback='0'))
+    ber_args = {"modulation": config.get('ber', 'modulation', fallback='bpsk').strip().lower(),
+                "pulse": config.get('ber', 'pulse_shape', fallback='rect').strip().lower(),
+                "sps": int(config.get('ber', 'samples_per_symbol', fallback='4')),
+                "target_errors": int(float(config.get('ber', 'target_errors', fallback='100'))),
+                "max_bits": int(float(config.get('ber', 'max_bits', fallback='1e7'))),
+                "batch_bits": int(float(config.get('ber', 'batch_bits', fallback='1e5')))}
 
     tau = float(config.get('signaling', 'time_accelerating_factor'))
     td = float(config.get('signaling', 'time_offset'))
@@ -97,7 +172,15 @@ def analysis_cnf_file_parser(cnf_file):
                       "code_period":code_period,
                       "n_o_samples":n_o_samples,
                       "time_accelerating_factor": tau,
-                      "time_offset": td}
+                      "time_offset": td,
+                      "sweep_polys": sweep_polys,
+                      "sweep_degree": sweep_degree,
+                      "sweep_primitive": sweep_primitive,
+                      "sweep_workers": sweep_workers,
+                      "ber_ebn0_db": ber_ebn0_db,
+                      "ber_seed": ber_seed,
+                      "ber_workers": ber_workers,
+                      "ber_args": ber_args}
 
     return analysis_setup
 
@@ -0,0 +1,250 @@
+"""
+Memory-mapped waveform files.
+
+Waveforms are written block by block straight into a memory-mapped file, so a signal longer
+than the memory is generated by the streaming chain of *modulators.block_stream* without
+ever being held in memory at once. The file is either a *.npy* file (any other extension
+gives a raw headerless file, e.g. *.iq* or *.bin*) with the samples stored as
+
+* ``'complex64'`` - complex baseband samples in single precision (1/2 of complex128),
+* ``'float32'`` - real samples in single precision, e.g. the passband signal,
+* ``'int16iq'`` - interleaved I and Q as 16-bit integers, rows (I, Q) of a (samples, 2)
+  array, the value *full_scale* is stored as 32767 and larger values are clipped
+  (1/4 of complex128),
+* ``'bits'`` - one bit per sample, '1' for the samples above zero, packed into bytes with
+  the first sample in the most significant bit, for two-level signals such as the
+  rectangular BPSK baseband (1/128 of complex128).
+
+Next to the waveform a JSON sidecar file (the name of the waveform file followed by *.json*)
+records the storage type, the number of samples, *full_scale* and the *levels* of the bits,
+the values the stored array alone does not carry, e.g. the number of samples of 'bits' files
+padded to whole bytes. Files are read back by *open_waveform* as read-only memory maps
+without any copying, *read_info* reads the sidecar and *decode* turns the stored array into
+complex samples, *load_waveform* does all the three.
+
+**Example:**
+
+>>> bb = bs.baseband_blocks(prn.ssrg_blocks(init, fb, 4096), s_rate, f_sampl, 65536)
+>>> write_waveform("../data/scenario.npy", bb, n_samples, dtype='int16iq', full_scale=1.0)
+>>> iq = load_waveform("../data/scenario.npy")
+"""
+import json
+import logging
+import os
+import numpy as np
+
+WAVEFORM_DTYPES = ("complex64", "float32", "int16iq", "bits")
+
+_INT16_MAX = 32767
+
+
+def storage(n_samples, dtype):
+    """
+    Shape and numpy type of the stored array of a waveform
+
+    :param n_samples: number of samples
+    :param dtype: storage type, see WAVEFORM_DTYPES
+    :return: tuple (shape, numpy dtype)
+    """
+    if dtype == 'complex64':
+        return (n_samples,), np.dtype(np.complex64)
+    if dtype == 'float32':
+        return (n_samples,), np.dtype(np.float32)
+    if dtype == 'int16iq':
+        return (n_samples, 2), np.dtype(np.int16)
+    if dtype == 'bits':
+        return (-(-n_samples // 8),), np.dtype(np.uint8)
+    raise ValueError("Unknown waveform type '%s', use %s" % (dtype, ", ".join(WAVEFORM_DTYPES)))
+
+
+def _is_npy(filename):
+    return filename.lower().endswith(".npy")
+
+
+def info_filename(filename):
+    """
+    Name of the JSON sidecar file of a waveform file
+    """
+    return filename + ".json"
+
+
+class WaveformWriter:
+    """
+    Writer of the blocks of a waveform into a memory-mapped file of a fixed length
+
+    :param filename: output file, rewritten, *.npy* or a raw file
+    :param n_samples: number of samples of the whole waveform
+    :param dtype: storage type (default complex64), see WAVEFORM_DTYPES
+    :param full_scale: value stored as the largest integer of 'int16iq' (default 1.0)
+    :param levels: values of the bits '0' and '1' of 'bits' (default (-1, 1)), the samples
+                   above the middle of the levels are stored as '1'
+
+    **Example:**
+
+    >>> with WaveformWriter("../data/passband.npy", n_samples, dtype='float32') as w:
+    ...     for x in bs.signal_chain(chips, s_rate, f_sampl, f0, 65536):
+    ...         w.write(x)
+    """
+
+    def __init__(self, filename, n_samples, dtype='complex64', full_scale=1.0, levels=(-1, 1)):
+        shape, np_dtype = storage(int(n_samples), dtype)
+        self.filename = filename
+        self.n_samples = int(n_samples)
+        self.dtype = dtype
+        self.full_scale = float(full_scale)
+        self.levels = (float(levels[0]), float(levels[1]))
+        self.pos = 0  # samples written
+        self._bits = np.zeros(0, dtype=bool)  # bits not packed yet, 'bits' only
+        if _is_npy(filename):
+            self.data = np.lib.format.open_memmap(filename, mode='w+', dtype=np_dtype, shape=shape)
+        else:
+            self.data = np.memmap(filename, dtype=np_dtype, mode='w+', shape=shape)
+
+    def write(self, block):
+        """
+        Writes the next block of samples
+
+        :param block: samples, real or complex
+        """
+        block = np.ravel(block)
+        n = block.size
+        if self.pos + n > self.n_samples:
+            raise ValueError("%s samples do not fit into %s, %s samples left"
+                             % (n, self.filename, self.n_samples - self.pos))
+        view = self.data[self.pos:self.pos + n]
+        if self.dtype == 'complex64':
+            view[...] = block
+        elif self.dtype == 'float32':
+            view[...] = block.real
+        elif self.dtype == 'int16iq':
+            scale = _INT16_MAX / self.full_scale
+            for col, comp in enumerate((block.real, np.imag(block))):
+                view[:, col] = np.rint(np.clip(comp * scale, -_INT16_MAX, _INT16_MAX))
+        else:
+            # only complete bytes are written, the remaining bits wait for the next block
+            bits = np.concatenate((self._bits, block.real > sum(self.levels) / 2))
+            n_full = bits.size // 8
+            byte0 = (self.pos - self._bits.size) // 8
+            self.data[byte0:byte0 + n_full] = np.packbits(bits[:n_full * 8])
+            self._bits = bits[n_full * 8:]
+        self.pos += n
+
+    def close(self):
+        """
+        Writes the remaining bits, flushes the file and writes the sidecar file
+        """
+        if self.data is None:
+            return
+        if self.dtype == 'bits' and self._bits.size:
+            self.data[(self.pos - self._bits.size) // 8] = np.packbits(self._bits)[0]
+            self._bits = np.zeros(0, dtype=bool)
+        if self.pos < self.n_samples:
+            logging.getLogger(__name__).warning("%s: %s of %s samples written, the rest are zeros",
+                                                self.filename, self.pos, self.n_samples)
+        self.data.flush()
+        self.data = None
+        info = {"dtype": self.dtype, "n_samples": self.n_samples, "full_scale": self.full_scale,
+                "levels": list(self.levels)}
+        with open(info_filename(self.filename), 'w') as f:
+            json.dump(info, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_waveform(filename, blocks, n_samples, **args):
+    """
+    Writes a stream of blocks into a memory-mapped file, the stream is cut at *n_samples*
+
+    :param filename: output file, *.npy* or a raw file
+    :param blocks: iterable of blocks of samples, e.g. *block_stream.baseband_blocks*
+    :param n_samples: number of samples written
+    :param args: optional arguments *dtype*, *full_scale* and *levels* of *WaveformWriter*
+    :return: number of samples written
+    """
+    logger = logging.getLogger(__name__)
+    with WaveformWriter(filename, n_samples, **args) as w:
+        for block in blocks:
+            block = np.ravel(block)[:n_samples - w.pos]
+            w.write(block)
+            if w.pos >= n_samples:
+                break
+        n = w.pos
+    logger.debug("waveform written to %s, %s samples, %s", filename, n, args.get('dtype', 'complex64'))
+    return n
+
+
+def read_info(filename):
+    """
+    Storage type, number of samples, full scale and levels of a waveform file
+
+    :param filename: waveform file, *.npy* or raw file
+    :return: dictionary of the sidecar file, the keyword arguments of *decode*, empty when
+             the waveform has no sidecar file
+    """
+    if not os.path.exists(info_filename(filename)):
+        return {}
+    with open(info_filename(filename)) as f:
+        info = json.load(f)
+    if "levels" in info:
+        info["levels"] = tuple(info["levels"])
+    return info
+
+
+def open_waveform(filename, dtype=None):
+    """
+    Opens a waveform file as a read-only memory map
+
+    :param filename: *.npy* or raw file
+    :param dtype: storage type of a raw file, see WAVEFORM_DTYPES, *.npy* files carry it,
+                  by default the type of the sidecar file or complex64 without it
+    :return: memory-mapped array of the stored samples, see *storage*
+    """
+    if _is_npy(filename):
+        return np.load(filename, mmap_mode='r')
+    if dtype is None:
+        dtype = read_info(filename).get('dtype', 'complex64')
+    _, np_dtype = storage(0, dtype)
+    data = np.memmap(filename, dtype=np_dtype, mode='r')
+    return data.reshape(-1, 2) if dtype == 'int16iq' else data
+
+
+def decode(data, dtype='complex64', n_samples=None, **args):
+    """
+    Samples of a stored waveform
+
+    :param data: stored array, e.g. from *open_waveform*
+    :param dtype: storage type, see WAVEFORM_DTYPES
+    :param n_samples: number of samples of a 'bits' waveform, all the bits when None
+    :param args: optional arguments *full_scale* of 'int16iq' (default 1.0) and *levels*,
+                 the values of the bits '0' and '1' (default (-1, 1)), the values written
+                 to the sidecar file are returned by *read_info*
+    :return: complex64 samples, float32 for 'float32'
+    """
+    if dtype in ('complex64', 'float32'):
+        return np.asarray(data)
+    if dtype == 'int16iq':
+        scale = np.float32(args.get('full_scale', 1.0) / _INT16_MAX)
+        x = np.empty(data.shape[0], dtype=np.complex64)
+        np.multiply(data[:, 0], scale, out=x.real)
+        np.multiply(data[:, 1], scale, out=x.imag)
+        return x
+    if dtype == 'bits':
+        lo, hi = args.get('levels', (-1, 1))
+        bits = np.unpackbits(np.asarray(data), count=n_samples)
+        return np.where(bits, hi, lo).astype(np.complex64)
+    raise ValueError("Unknown waveform type '%s', use %s" % (dtype, ", ".join(WAVEFORM_DTYPES)))
+
+
+def load_waveform(filename):
+    """
+    Samples of a waveform file decoded with the values of its sidecar file
+
+    :param filename: *.npy* or raw file written by *WaveformWriter*
+    :return: complex64 samples, float32 for 'float32', see *decode*
+    """
+    info = read_info(filename)
+    return decode(open_waveform(filename, info.get('dtype')), **info)
@@ -0,0 +1,7 @@
+"""
+The modules are imported the way the runner imports them, from the *src* folder.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,36 @@
+"""
+Bit error rates of the Monte Carlo engine against the theory of the AWGN channel.
+"""
+import math
+import numpy as np
+import pytest
+
+import ber
+
+
+def q_theory(ebn0_db):
+    # BPSK and Gray coded QPSK, Q(sqrt(2 Eb / N0))
+    return 0.5 * math.erfc(math.sqrt(10 ** (ebn0_db / 10)))
+
+
+@pytest.mark.parametrize("modulation", ["bpsk", "qpsk"])
+@pytest.mark.parametrize("ebn0_db", [0.0, 4.0, 7.0])
+def test_rect_ber_follows_theory(modulation, ebn0_db):
+    row = ber.ber_point(ebn0_db, np.random.default_rng(7), modulation=modulation,
+                        pulse='rect', target_errors=400, max_bits=2 * 10 ** 6)
+    expected = q_theory(ebn0_db) * row["bits"]
+    # the error count is binomial, four standard deviations
+    assert abs(row["errors"] - expected) < 4 * math.sqrt(expected)
+
+
+def test_curve_does_not_depend_on_workers():
+    args = dict(modulation='qpsk', target_errors=50, max_bits=10 ** 5)
+    one = ber.ber_curve([2.0, 5.0], seed=3, workers=1, **args)
+    two = ber.ber_curve([2.0, 5.0], seed=3, workers=2, **args)
+    assert one == two
+
+
+@pytest.mark.parametrize("pulse", ["sinc", "rcos"])
+def test_nonlinear_pulses_are_rejected(pulse):
+    with pytest.raises(ValueError):
+        ber.ber_curve([4.0], seed=1, workers=1, pulse=pulse)
@@ -0,0 +1,36 @@
+"""
+Streaming transmitter, the joined blocks against the signal mapped at once.
+"""
+import numpy as np
+import pytest
+
+from modulators import constallation_mappers as cm
+from modulators import block_stream as bs
+
+S_RATE = 1.023e6
+F_SAMPL = 24 * S_RATE
+
+
+def _one_shot(data, n_samples, **args):
+    # the time axis of the runner, np.arange(0, T, 1 / f_sampl)
+    t = np.arange(n_samples) * (1 / F_SAMPL)
+    return cm.lut_map(t, data, S_RATE, **args)
+
+
+@pytest.mark.parametrize("block_size", [97, 1000, 4096])
+@pytest.mark.parametrize("modulation", sorted(cm.CONSTELLATIONS))
+def test_rect_blocks_equal_one_shot(modulation, block_size):
+    k = cm.bits_per_symbol(modulation)
+    data = np.random.default_rng(4).integers(0, 2, 200 * k).astype(bool)
+    chips = [data[i:i + 37] for i in range(0, data.size, 37)]
+    got = np.concatenate(list(bs.baseband_blocks(chips, S_RATE, F_SAMPL, block_size,
+                                                 modulation=modulation)))
+    assert got.size == 200 * 24
+    np.testing.assert_array_equal(got, _one_shot(data, got.size, modulation=modulation))
+
+
+def test_rect_blocks_with_delay_and_spaces():
+    data = np.random.default_rng(5).integers(0, 2, 300).astype(bool)
+    args = dict(td=3.3 / F_SAMPL, tp=0.75 / S_RATE, ts=0.25 / S_RATE)
+    got = np.concatenate(list(bs.baseband_blocks([data], S_RATE, F_SAMPL, 333, **args)))
+    np.testing.assert_array_equal(got, _one_shot(data, got.size, **args))
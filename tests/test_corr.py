@@ -0,0 +1,21 @@
+"""
+Correlations of code families, the bit-packed backend against the FFT backend.
+"""
+import numpy as np
+import pytest
+
+from dsp import corrNumpy as cn
+
+
+@pytest.mark.parametrize("n", [1, 7, 63, 64, 65, 127, 1023])
+@pytest.mark.parametrize("maxima", [False, True])
+def test_packed_equals_fft(n, maxima):
+    codes = np.random.default_rng(n).integers(0, 2, (5, n)).astype(bool)
+    np.testing.assert_array_equal(cn.family_corr(codes, backend='packed', maxima=maxima),
+                                  cn.family_corr(codes, backend='fft', maxima=maxima))
+
+
+def test_packed_batches():
+    codes = np.random.default_rng(0).integers(0, 2, (9, 200)).astype(bool)
+    np.testing.assert_array_equal(cn.family_corr(codes, backend='packed', batch_size=1),
+                                  cn.family_corr(codes, backend='packed'))
@@ -0,0 +1,43 @@
+"""
+Decimation of the plotted traces.
+"""
+import numpy as np
+import pytest
+
+from utils import analytic_plots as aplt
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+
+
+def test_axes_limits_decimate_the_visible_samples():
+    from matplotlib import pyplot as plt
+    x = np.arange(200000) * 1e-3
+    y = np.sin(7 * x)
+    fig = plt.figure()
+    ax = fig.add_subplot(111)
+    aplt.timedomain_plot(ax, x, y, texts={"y_legend": "y"}, axes=[10, 20, -1, 1])
+    xd = ax.lines[0].get_xdata()
+    plt.close(fig)
+    assert xd[0] < 10 and xd[-1] > 20  # the line reaches the borders of the axes
+    assert xd[1] >= 10 and xd[-2] <= 20  # no samples outside the axes are drawn
+    assert xd.size <= 2 * aplt.axes_width_px(ax) + 4
+
+
+def test_no_decimation():
+    from matplotlib import pyplot as plt
+    x = np.arange(50000)
+    fig = plt.figure()
+    ax = fig.add_subplot(111)
+    aplt.timedomain_plot(ax, x, np.cos(x), texts={"y_legend": "y"}, decimate=False)
+    assert ax.lines[0].get_xdata().size == x.size
+    plt.close(fig)
+
+
+def test_minmax_keeps_the_envelope_and_the_ends():
+    y = np.random.default_rng(0).normal(size=10007)
+    x = np.arange(y.size)
+    xd, yd = aplt.minmax_decimate(x, y, 100)
+    assert xd[0] == 0 and xd[-1] == y.size - 1
+    assert yd.min() == y.min() and yd.max() == y.max()
+    assert np.all(np.diff(xd) > 0)
@@ -0,0 +1,44 @@
+"""
+Shift register generators, the packed-word backend against the reference loop.
+"""
+import numpy as np
+import pytest
+
+from siggens import PRN_bitstreams as prn
+from siggens import polynomials as pl
+
+INIT = np.array([1, 0, 0, 0, 0])
+FB = np.array([0, 0, 1, 0, 1])
+
+
+def test_packed_equals_loop():
+    np.testing.assert_array_equal(prn.ssrg(INIT, FB, n_bits=100),
+                                  prn.ssrg(INIT, FB, n_bits=100, backend='loop'))
+
+
+@pytest.mark.parametrize("backend", ["packed", "loop"])
+def test_feedback_longer_than_register(backend):
+    fb = np.array([0, 0, 1, 0, 1, 0, 0, 0, 0, 1])
+    with pytest.raises(ValueError):
+        prn.ssrg(INIT, fb, n_bits=10, backend=backend)
+
+
+def test_trajectory_checks_the_register():
+    with pytest.raises(ValueError):
+        prn.ssrg_trajectory(INIT, FB[:4], 10)
+    with pytest.raises(ValueError):
+        prn.ssrg_trajectory(np.ones(65, dtype=int), np.ones(65, dtype=int), 10)
+    with pytest.raises(ValueError):
+        prn.lfsr_chips(1, 0b1000000101, 5, 10)
+
+
+@pytest.mark.parametrize("token, expected", [("45", (0o45, "")), ("45E", (0o45, "E")),
+                                             ("45e", (0o45, "E")), (" 211e ", (0o211, "E"))])
+def test_parse_octal(token, expected):
+    assert pl.parse_octal(token) == expected
+
+
+@pytest.mark.parametrize("token", ["e", "45EE", "4x"])
+def test_parse_octal_rejects(token):
+    with pytest.raises(ValueError):
+        pl.parse_octal(token)
@@ -0,0 +1,50 @@
+"""
+Noiseless loopback of the transmitter and the receiver, every modulation with every pulse.
+"""
+import numpy as np
+import pytest
+
+from modulators import constallation_mappers as cm
+from modulators import up_convertors as uc
+from demodulators import down_convertors as dc
+from demodulators import symbol_detectors as sd
+
+SPS = 16  # samples per symbol
+F0 = 4.0  # carrier frequency, symbol rate 1
+
+
+def _loopback(modulation, pulse, pE=0.0, n_symbols=1500, seed=1):
+    # bit errors of the signal mapped, up-converted, down-converted and decided
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 2, n_symbols * cm.bits_per_symbol(modulation))
+    t = np.arange(n_symbols * SPS) / SPS
+    p_args = {} if pulse == 'rect' else {'span': 8}
+    bb = cm.lut_map(t, data, 1.0, modulation=modulation, pulse=pulse, **p_args)
+    x = uc.quad_mod(bb, t, F0, 0, pE, 0)
+    z = sd.matched_filter(dc.quad_demod(x, t, F0, 0, pE), 1.0, SPS, pulse=pulse, **p_args)
+    decided = sd.hard_decisions(z, modulation)
+    assert decided.size == data.size
+    return int(np.count_nonzero(decided != data))
+
+
+@pytest.mark.parametrize("pulse", ["rect", "sinc", "rcos"])
+@pytest.mark.parametrize("modulation", sorted(cm.CONSTELLATIONS))
+def test_loopback_without_noise(modulation, pulse):
+    assert _loopback(modulation, pulse) == 0
+
+
+@pytest.mark.parametrize("pulse", ["rect", "sinc", "rcos"])
+@pytest.mark.parametrize("modulation", sorted(cm.CONSTELLATIONS))
+def test_loopback_with_phase_error(modulation, pulse):
+    assert _loopback(modulation, pulse, pE=0.2) == 0
+
+
+@pytest.mark.parametrize("pulse", ["sinc", "rcos"])
+def test_symbols_cut_by_the_signal_edges(pulse):
+    # the first and the last pulses are centered on the edges, half of the taps are outside
+    t = np.arange(3 * SPS) / SPS
+    bb = cm.lut_map(t, np.zeros(12, dtype=int), 1.0, modulation='16qam', pulse=pulse, span=8)
+    z = sd.matched_filter(bb, 1.0, SPS, pulse=pulse, span=8)
+    # every output stays in the decision region of the corner point -3 - 3j, not at half level
+    assert z.size == 3
+    assert np.all(z.real < -2) and np.all(z.imag < -2)
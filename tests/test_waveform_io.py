@@ -0,0 +1,28 @@
+"""
+Waveform files, written block by block and loaded with the values of the sidecar file.
+"""
+import numpy as np
+import pytest
+
+from utils import waveform_io as wio
+
+
+@pytest.mark.parametrize("dtype", wio.WAVEFORM_DTYPES)
+@pytest.mark.parametrize("ext", [".npy", ".iq"])
+def test_round_trip_of_a_zero_one_signal(tmp_path, dtype, ext):
+    # the rectangular 0/1 signal of the runner, 1003 samples do not fill whole bytes
+    c = np.random.default_rng(0).integers(0, 2, 1003).astype(float)
+    fn = str(tmp_path / ("w" + ext))
+    wio.write_waveform(fn, [c[:500], c[500:]], c.size, dtype=dtype, levels=(0, 1))
+    info = wio.read_info(fn)
+    assert info["n_samples"] == c.size and info["levels"] == (0, 1)
+    x = wio.load_waveform(fn)
+    assert x.size == c.size
+    np.testing.assert_allclose(x.real, c, atol=1e-4)
+
+
+def test_int16iq_full_scale(tmp_path):
+    bb = np.exp(1j * np.linspace(0, 6, 100)) * 4
+    fn = str(tmp_path / "w.npy")
+    wio.write_waveform(fn, [bb], bb.size, dtype='int16iq', full_scale=4.0)
+    np.testing.assert_allclose(wio.load_waveform(fn), bb, atol=1e-3)